@@ -2,6 +2,12 @@ import discord
 from discord import ApplicationContext
 
 from utils.bot import SurveyWolf
+from utils.database import database as db
+from utils import metrics, migrations
+from utils import embed_factory as ef
+from forms.survey.active import consent_cache
+from forms.survey import aggregates
+from forms.survey.template import template_cache
 from main import bot as survey_wolf_bot
 
 
@@ -15,6 +21,8 @@ class Developer(discord.Cog, guild_ids=survey_wolf_bot.config["dev_guilds"]):
     }
     logs = [discord.OptionChoice(x[1], x[0]) for x in log_text.items()]
     logging = discord.SlashCommandGroup("logging", "Actions For The Discord Facing Logging")
+    stats = discord.SlashCommandGroup("stats", "Performance Statistics For The Bot")
+    database = discord.SlashCommandGroup("database", "Actions For The Database Schema")
 
     async def cog_before_invoke(self, ctx: ApplicationContext) -> None:
         if ctx.guild_id not in self.bot.config["dev_guilds"]:
@@ -65,6 +73,81 @@ class Developer(discord.Cog, guild_ids=survey_wolf_bot.config["dev_guilds"]):
         self.bot.update_config(log, None, "None")
         await ctx.respond("Logging Unset", ephemeral=True)
 
+    @database.command(description="Applies Any Schema Migrations That Have Not Been Applied")
+    async def migrate(self, ctx: discord.ApplicationContext):
+        await ctx.defer(ephemeral=True)
+        applied = await migrations.migrate()
+        message = "- " + "\n- ".join(applied) if applied else "The Schema Is Already Up To Date"
+        await ctx.respond(embed=await ef.success(message), ephemeral=True)
+
+    @database.command(description="Recounts The Response Aggregates Used By The /results Summary")
+    async def rebuild_aggregates(
+        self,
+        ctx: discord.ApplicationContext,
+        template_id: discord.Option(int, description="Only Rebuild This Template", required=False, default=None),
+    ):
+        await ctx.defer(ephemeral=True)
+        if template_id is None:
+            count = await aggregates.rebuild_all_aggregates()
+            message = f"Rebuilt The Aggregates Of {count} Templates"
+        else:
+            await aggregates.rebuild_aggregates(template_id)
+            message = f"Rebuilt The Aggregates Of Template {template_id}"
+        await ctx.respond(embed=await ef.success(message), ephemeral=True)
+
+    @stats.command(description="Shows The SQL Statements That Have Taken The Most Total Time")
+    async def statements(self, ctx: discord.ApplicationContext):
+        statements = sorted(db.statements.values(), key=lambda x: x.total_time, reverse=True)
+        lines = [
+            f"`{x.name}` Calls: {x.calls} Total: {x.total_time * 1000:.0f}ms "
+            f"Avg: {x.average_time * 1000:.2f}ms Max: {x.max_time * 1000:.2f}ms"
+            for x in statements
+            if x.calls
+        ]
+        await ctx.respond(
+            embed=await ef.general("SQL Statements", "\n".join(lines[:20]) or "No Statements Have Been Run"),
+            ephemeral=True,
+        )
+
+    @stats.command(description="Shows How Saturated The Database Connection Pool Is")
+    async def pool(self, ctx: discord.ApplicationContext):
+        stats = db.pool_stats
+        message = f"""- Connections: {stats.in_use} In Use Of {db.pool_size} Open (Min {db.min_size} Max {db.max_size})
+- Peak In Use: {stats.max_in_use}
+- Waiting: {stats.waiting} (Peak {stats.max_waiting})
+- Wait Time: Avg {stats.average_wait * 1000:.2f}ms Max {stats.max_wait * 1000:.2f}ms
+- Acquires: {stats.acquires} Timeouts: {stats.timeouts}"""
+        if db.has_replica:
+            replica = db.replica_stats
+            message += f"""
+- Replica Connections: {replica.in_use} In Use Of {db.replica_pool_size} Open (Peak {replica.max_in_use})
+- Replica Wait Time: Avg {replica.average_wait * 1000:.2f}ms Max {replica.max_wait * 1000:.2f}ms
+- Replica Acquires: {replica.acquires} Fallbacks To Primary: {db.replica_fallbacks}"""
+        await ctx.respond(embed=await ef.general("Connection Pool", message), ephemeral=True)
+
+    @stats.command(description="Shows How Long Latency Sensitive Actions Take")
+    async def latency(self, ctx: discord.ApplicationContext):
+        lines = [
+            f"`{x.name}` Count: {x.count} Avg: {x.average * 1000:.2f}ms P50: {x.percentile(50) * 1000:.0f}ms "
+            f"P95: {x.percentile(95) * 1000:.0f}ms P99: {x.percentile(99) * 1000:.0f}ms Max: {x.max * 1000:.2f}ms"
+            for x in metrics.histograms.values()
+        ]
+        await ctx.respond(
+            embed=await ef.general("Latency", "\n".join(lines) or "Nothing Has Been Recorded"), ephemeral=True
+        )
+
+    @stats.command(description="Shows How Full The Caches Are And How Often They Are Used")
+    async def cache(self, ctx: discord.ApplicationContext):
+        t = template_cache
+        message = f"""- Consent: {len(consent_cache)} Of {consent_cache.maxsize} Entries
+- Consent Hits: {consent_cache.hits} Misses: {consent_cache.misses} Hit Rate: {consent_cache.hit_rate:.1%} \
+Evictions: {consent_cache.evictions}
+- Templates: {len(t)} Loaded, {t.size / 1_000_000:.1f} Of {t.max_size / 1_000_000:.1f}MB Recently Used
+- Guild Indexes: {t.guild_size / 1_000_000:.1f} Of {t.guild_max_size / 1_000_000:.1f}MB
+- Template Hits: {t.hits} Misses: {t.misses} Hit Rate: {t.hit_rate:.1%} Evictions: {t.evictions} \
+Expirations: {t.expirations}"""
+        await ctx.respond(embed=await ef.general("Caches", message), ephemeral=True)
+
 
 def setup(bot):
     bot.add_cog(Developer(bot))
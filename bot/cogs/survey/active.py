@@ -1,7 +1,9 @@
-from discord import Cog, slash_command, Option, ApplicationContext
+import asyncio
 
-from forms.survey.active import ActiveSurvey, load_active_surveys
-from forms.survey.template import title_autocomplete, get_templates
+from discord import Cog, slash_command, Option, ApplicationContext, Interaction
+
+from forms.survey.active import ActiveSurvey, load_active_surveys, route_survey_button
+from forms.survey.template import title_autocomplete, get_templates, warm_templates
 from utils.timers import Timer
 from utils import embed_factory as ef
 
@@ -9,6 +11,7 @@ from utils import embed_factory as ef
 class ActiveSurveyCommands(Cog):
     def __init__(self, bot):
         self.bot = bot
+        self._warm_up: asyncio.Task | None = None
 
     @slash_command()
     async def send(
@@ -51,8 +54,13 @@ class ActiveSurveyCommands(Cog):
 
     @Cog.listener(once=True)
     async def on_ready(self):
-        for view in await load_active_surveys():
-            self.bot.add_view(view)
+        template_ids = await load_active_surveys(self.bot)
+        # The Warm Up Runs In The Background So Clicks Redelivered After A Restart Are Not Held Up By It
+        self._warm_up = asyncio.create_task(warm_templates(template_ids))
+
+    @Cog.listener()
+    async def on_interaction(self, interaction: Interaction):
+        await route_survey_button(interaction)
 
 
 def setup(bot):
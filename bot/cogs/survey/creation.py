@@ -299,8 +299,7 @@ class EditQuestions(discord.ui.View):
 
     @discord.ui.button(label="Delete Question", style=discord.ButtonStyle.red, emoji="➖", row=1, disabled=True)
     async def delete(self, button: discord.Button, interaction: discord.Interaction):
-        q = self.wiz.template.questions.pop(self.current_pos)
-        await q.delete()
+        self.wiz.template.remove_question(self.current_pos)
         if len(self.wiz.template.questions) == 0:
             self.current_pos = -1
         else:
@@ -490,7 +489,8 @@ class CreationCog(discord.Cog):
         else:
             return await ctx.respond(embed=await ef.fail(f"No Survey Named `{name}` Found"), ephemeral=True)
         await template.fill_questions()
-        wiz = Wizard(template, ctx.author.id)
+        # The Wizard Edits A Copy So Users Taking The Survey Are Not Affected Until It Is Saved
+        wiz = Wizard(template.edit_copy(), ctx.author.id)
         await ctx.respond(embed=await wiz._create_embed(), view=wiz)
 
 
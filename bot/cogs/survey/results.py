@@ -2,8 +2,17 @@ import discord
 from discord import slash_command, Option
 from discord.ext import pages
 
+from forms.survey.export import export_responses
+from forms.survey.results import (
+    summarize,
+    summary_pages,
+    HAS_RESPONSES,
+    LazyPaginator,
+    QuestionPageSource,
+    ResponsePageSource,
+)
 from forms.survey.template import title_autocomplete, get_templates
-from questions.survey_question import from_db, SurveyQuestion
+from questions.survey_question import fetch_questions, SurveyQuestion
 from utils.database import database as db
 from utils import embed_factory as ef
 
@@ -26,12 +35,13 @@ class ResultsCog(discord.Cog):
             str,
             description="How Should The Results Be Grouped",
             choices=[
+                discord.OptionChoice("Summary", "3"),
                 discord.OptionChoice("By Question", "0"),
                 discord.OptionChoice("By Response", "1"),
                 # discord.OptionChoice("By Survey Instance", "2"),
             ],
             required=False,
-            default="0",
+            default="3",
         ),
     ):
         await ctx.defer(ephemeral=True)
@@ -43,104 +53,69 @@ class ResultsCog(discord.Cog):
             return await ctx.respond(embed=await ef.fail(f"No Survey Named `{name}` Found"), ephemeral=True)
 
         # Get Questions
-        sql = """SELECT * FROM surveys.questions WHERE survey_id=$1"""
-        questions: list[SurveyQuestion] = [await from_db(row) for row in await db.fetch(sql, template._id)]
-        questions.sort(key=lambda x: x.position)
+        questions: list[SurveyQuestion] = (await fetch_questions(template._id))[template._id]
 
-        if grouped == "0":
-            response_map = {q._id: [] for q in questions}
-
-            sql = """SELECT response_data, question FROM surveys.question_response
-            WHERE question_response.question = ANY($1::int[]);"""
-            responses = await db.fetch(sql, [q._id for q in questions])
-
-            if not responses:
+        if grouped == "3":
+            # The Counts Are Calculated By The Database. The Other Modes List Every Response
+            summaries = await summarize(template._id, questions)
+            if not summaries or summaries[0].total == 0:
                 return await ctx.respond(
                     embed=await ef.fail("There Are No Responses To This Survey Yet"),
                     ephemeral=True,
                 )
-
-            for response in responses:
-                response_map[response["question"]].append(response["response_data"])
-
-            page_groups = []
-            for question in questions:
-                question_embed = await question.display()
-                e = discord.Embed(title="Responses", description="")
-                embeds = []
-                for response in response_map[question._id]:
-                    r = await question.view_response(response)
-                    if len(r) == 0:
-                        continue
-                    response = "- " + discord.utils.escape_markdown(r)
-                    if len(e.description) != 0 and len(e) + len(response) > 1024:
-                        embeds.append(pages.Page(embeds=[question_embed, e]))
-                        e = discord.Embed(title="Responses", description="")
-                    e.description += response + "\n"
-                if len(e.description) != 0:
-                    embeds.append(pages.Page(embeds=[question_embed, e]))
-                if len(embeds) == 0:
-                    embeds.append(
-                        [
-                            question_embed,
-                            await ef.general(
-                                "There Are No Responses To This Question",
-                                message="This Question Was Optional And No One Answered It!",
-                            ),
-                        ]
-                    )
-                page_groups.append(
-                    pages.PageGroup(label=question.title, description=question.description, pages=embeds)
-                )
-
-            pgn = pages.Paginator(pages=page_groups, show_menu=True, timeout=840)
+            pgn = pages.Paginator(pages=summary_pages(summaries), timeout=840)
             await pgn.respond(ctx.interaction, ephemeral=True)
 
-        elif grouped == "1":
-            sql = """SELECT r.response_num, q.question, q.response_data, r.id
-            FROM surveys.responses AS r INNER JOIN surveys.question_response AS q ON r.id = q.response 
-            WHERE r.template_id = $1;"""
-            responses = await db.fetch(sql, template._id)
-
-            if not responses:
+        else:
+            if not await db.fetchval(HAS_RESPONSES, template._id):
                 return await ctx.respond(
                     embed=await ef.fail("There Are No Responses To This Survey Yet"),
                     ephemeral=True,
                 )
+            # Pages Are Loaded As They Are Viewed So Large Surveys Respond As Quickly As Small Ones
+            if grouped == "0":
+                sources = [QuestionPageSource(q) for q in sorted(questions, key=lambda x: x.position)]
+            else:
+                sources = [ResponsePageSource(template._id, questions)]
+            await LazyPaginator(sources).respond(ctx)
+
+    @slash_command(description="Download The Responses Of A Survey As A Spreadsheet Or JSON File")
+    @discord.default_permissions(manage_guild=True)
+    async def export(
+        self,
+        ctx,
+        name: Option(
+            str,
+            description="The Survey To Export",
+            autocomplete=title_autocomplete,
+        ),
+        file_format: Option(
+            str,
+            name="format",
+            description="The Format Of The File",
+            choices=[discord.OptionChoice("CSV", "csv"), discord.OptionChoice("JSON Lines", "jsonl")],
+            required=False,
+            default="csv",
+        ),
+        compress: Option(bool, description="Compress The File With gzip", required=False, default=True),
+    ):
+        await ctx.defer(ephemeral=True)
+        templates = await get_templates(ctx.guild_id)
+        for template in templates:
+            if name == str(template._id) or name == template.title:
+                break
+        else:
+            return await ctx.respond(embed=await ef.fail(f"No Survey Named `{name}` Found"), ephemeral=True)
 
-            response_map = {}
-            for response in responses:
-                response_map.setdefault((response["id"], response["response_num"]), []).append(
-                    (response["question"], response["response_data"])
-                )
-
-            question_map = {q._id: q for q in questions}
-
-            page_groups = []
-            for n, group in enumerate(sorted(response_map.keys())):
-                response_embed = discord.Embed(title="Response ID", description=group[0])
-                e = discord.Embed(title="Responses", description="")
-                embeds = []
-                for response in sorted(response_map[group], key=lambda x: question_map[x[0]].position):
-                    question = question_map[response[0]]
-                    r = await question.view_response(response[1])
-                    if len(r) == 0:
-                        continue
-                    response_text = f"**Question {question.position + 1}:** {await question.short_display()}"
-                    response_text += "\n- " + discord.utils.escape_markdown(r)
-                    if len(e.description) != 0 and len(e) + len(response_text) > 1024:
-                        embeds.append(pages.Page(embeds=[response_embed, e]))
-                        e = discord.Embed(title="Responses", description="")
-                    e.description += response_text + "\n"
-                if len(e.description) != 0:
-                    embeds.append(pages.Page(embeds=[response_embed, e]))
-                if len(embeds) == 0:
-                    # If the survey only has option questions and all questions were skipped
-                    continue
-                page_groups.append(pages.PageGroup(label=f"Response {n + 1}", pages=embeds))
-
-            pgn = pages.Paginator(pages=page_groups, show_menu=True, timeout=840)
-            await pgn.respond(ctx.interaction, ephemeral=True)
+        questions: list[SurveyQuestion] = (await fetch_questions(template._id))[template._id]
+        file, filename, size = await export_responses(template, questions, file_format, compress)
+        with file:
+            if size > ctx.guild.filesize_limit:
+                message = f"The Export Is {size / 1_000_000:.1f}MB Which Is Larger Than Discord Allows"
+                if not compress:
+                    message += ". Try Again With `compress` Enabled"
+                return await ctx.respond(embed=await ef.fail(message), ephemeral=True)
+            await ctx.respond(file=discord.File(file, filename), ephemeral=True)
 
 
 def setup(bot):
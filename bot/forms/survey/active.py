@@ -1,28 +1,145 @@
 from datetime import datetime, timedelta, UTC
-from typing import TYPE_CHECKING
+from time import perf_counter
 
 import discord
 from asyncpg import Record
+from cachetools import LRUCache
 
 from forms.survey.template import SurveyTemplate
+from questions.session import SurveySession
 from utils.database import database as db
-from utils import embed_factory as ef
+from utils import embed_factory as ef, metrics
+from utils.cache import create_cache
 from utils.timers import Timer
 from utils.utils import encrypt_id
 
 
 CONSENT_VERSION = 1
 
+CONSENT_UPSERT = db.statement(
+    "consent_upsert",
+    "INSERT INTO surveys.data_sharing_consent (user_id, guild_id, timestamp, version_id) "
+    "VALUES ($1, $2, $3, $4) ON CONFLICT (user_id, guild_id) DO UPDATE SET version_id = excluded.version_id;",
+)
+# Every Check Made Before A User Can Take A Survey In One Round Trip. Consent Is Only Looked Up When It Is Not Cached
+# It Is Read From The Primary So A Response That Was Just Saved Is Counted By The Times Taken
+ELIGIBILITY = db.statement(
+    "eligibility",
+    """SELECT
+        CASE WHEN $5::boolean THEN
+            (SELECT version_id FROM surveys.data_sharing_consent WHERE user_id = $1 AND guild_id = $2)
+        END AS consent_version,
+        (SELECT max(response_num) FROM surveys.responses WHERE active_survey_id = $3 AND user_id = $4) AS times_taken;""",
+)
+# The Row Lock Taken By The Update Makes Concurrent Reservations Wait On Each Other, So The Maximum Is Never Passed
+RESERVE_ENTRY = db.statement(
+    "reserve_entry",
+    """UPDATE surveys.active_guild_surveys SET entries = entries + 1
+    WHERE id = $1 AND entries < $2 RETURNING entries;""",
+)
+RELEASE_ENTRY = db.statement(
+    "release_entry",
+    """UPDATE surveys.active_guild_surveys SET entries = entries - 1 WHERE id = $1 AND entries > 0;""",
+)
+COMPLETED_ENTRIES = db.statement(
+    "completed_entries", """SELECT COUNT(*) FROM surveys.responses WHERE active_survey_id = $1;"""
+)
+# Entries Reserved By Users Taking A Survey When The Bot Stopped Are Never Released, So They Are Reset To The
+# Completed Entries Before The Bot Logs In. Only The Bot Reserves Entries, So None Can Be In Use At That Point
+RECONCILE_ENTRIES = db.statement(
+    "reconcile_entries",
+    """UPDATE surveys.active_guild_surveys AS a
+    SET entries = (SELECT COUNT(*) FROM surveys.responses AS r WHERE r.active_survey_id = a.id)
+    WHERE NOT a.ended;""",
+)
+
+CLICK_LATENCY = metrics.histogram("Take Survey Click")
+
+
+class ConsentCache:
+    """
+    Remembers The Consent Version Each User Agreed To In Each Guild, Including Users That Have Not Consented
+
+    Only `DataSharingConsent.confirm` changes consent, and it updates the cache. Since the version is stored, bumping
+    `CONSENT_VERSION` makes every cached entry out of date without clearing the cache.
+
+    Attributes
+    ----------
+    hits: int
+        Lookups that were answered from the cache.
+    misses: int
+        Lookups that had to go to the database.
+    """
+
+    def __init__(self):
+        self.hits: int = 0
+        self.misses: int = 0
+        self.configure()
+
+    def configure(self, max_entries: int = 10_000, ttl: float | None = None) -> None:
+        """
+        Sets The Cache Options From The Config. Anything Already Cached Is Dropped
+        :param max_entries: The most users to remember
+        :param ttl: Seconds an answer is remembered for. None keeps answers until they are evicted
+        """
+        self._cache = create_cache(max_entries, ttl)
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    @property
+    def evictions(self) -> int:
+        return self._cache.evictions
+
+    @property
+    def maxsize(self) -> int:
+        return self._cache.maxsize
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, user_id: int, guild_id: int) -> tuple[bool, int | None]:
+        """
+        Looks Up A Users Consent
+        :param user_id: The ID of the user
+        :param guild_id: The ID of the guild
+        :return: If the lookup was cached and the consent version, which is None if the user has not consented
+        """
+        try:
+            version = self._cache[(user_id, guild_id)]
+        except KeyError:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, version
+
+    def set(self, user_id: int, guild_id: int, version: int | None) -> None:
+        self._cache[(user_id, guild_id)] = version
+
+    def invalidate(self, user_id: int, guild_id: int) -> None:
+        self._cache.pop((user_id, guild_id), None)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+consent_cache = ConsentCache()
+
+# Surveys Are Loaded When Their Button Is Clicked, So Only Recently Used Surveys Are Kept In Memory
+ACTIVE_SURVEY_CACHE = LRUCache(maxsize=1024)
+
 
 class ActiveSurvey:
     def __init__(self, template: int | SurveyTemplate, end: datetime | timedelta | None = None):
         self.template: int | SurveyTemplate = template
         if end is None:
-            self.end = datetime.now() + template.duration
+            self.end = datetime.now(UTC) + template.duration
         elif isinstance(end, datetime):
             self.end = end.replace(tzinfo=UTC)
         elif isinstance(end, timedelta):
-            self.end = datetime.now() + end
+            self.end = datetime.now(UTC) + end
         self._channel_id = None
         self._message_id = None
         self._id = None
@@ -38,9 +155,12 @@ class ActiveSurvey:
 
     @classmethod
     async def fetch(cls, id: int):
-        sql = """SELECT end_date, template_id, channel_id, message_id FROM surveys.active_guild_surveys WHERE id=$1"""
-        row = await db.fetch_one(sql, id)
-        return cls.load(row)
+        sql = """SELECT id, end_date, template_id, channel_id, message_id FROM surveys.active_guild_surveys 
+        WHERE id=$1 AND NOT ended"""
+        row = await db.fetch_one(sql, id, replica=False)
+        if row is None:
+            return None
+        return await cls.load(row)
 
     async def save(self):
         sql = """
@@ -52,77 +172,105 @@ class ActiveSurvey:
         else:
             template = self.template
         self._id = await db.fetchval(
-            sql, self.end.astimezone(UTC).replace(tzinfo=None), template, self._channel_id, self._message_id
+            sql,
+            self.end.astimezone(UTC).replace(tzinfo=None),
+            template,
+            self._channel_id,
+            self._message_id,
+            replica=False,
         )
 
     async def send(self, interaction: discord.Interaction, message: str):
-        v = ActiveSurveyView(self)
-        await interaction.followup.send(
+        sent = await interaction.followup.send(
             embeds=[await ef.general("Take The Survey Below!", message=message), await self.template.summary(self.end)],
-            view=v,
+            view=ActiveSurveyView(self),
         )
-        await self.start_timer(v.end_survey)
-
-    async def start_timer(self, callback):
-        self._timer = Timer(self.end, callback)
-
-    async def end_survey(self):
-        # Expired Surveys Should Just No Longer Be Loaded. No Need To Remove Them
-        # sql = """DELETE FROM surveys.active_guild_surveys WHERE id=$1"""
-        # await db.execute(sql, self._id)
-        await self._timer.cancel()
-
-
-class ActiveSurveyView(discord.ui.View):
-    def __init__(self, survey: ActiveSurvey):
-        super().__init__(timeout=None)
-        self.survey = survey
-        self.add_item(SurveyButton(survey._id))
-
-    async def end_survey(self):
-        await self.survey.end_survey()
-        self.disable_all_items()
-        await self.message.edit(embeds=[await ef.general("This Survey Has Ended"), self.message.embeds[1]], view=self)
-        self.stop()
-
-
-class SurveyButton(discord.ui.Button):
-    def __init__(self, custom_id: int):
-        super().__init__(label="Take Survey", style=discord.ButtonStyle.blurple, custom_id=str(custom_id))
-        self.encrypted_user_id: str | None = None
-
-    async def callback(self, interaction: discord.Interaction):
-        template = self.view.survey.template
+        # The Message Is Saved So It Can Be Edited When The Survey Ends Without Keeping A View Around
+        self._channel_id, self._message_id = sent.channel.id, sent.id
+        sql = """UPDATE surveys.active_guild_surveys SET channel_id=$2, message_id=$3 WHERE id=$1"""
+        await db.execute(sql, self._id, self._channel_id, self._message_id)
+        ACTIVE_SURVEY_CACHE[self._id] = self
+        await self.start_timer(interaction.client)
+
+    async def start_timer(self, client: discord.Client):
+        self._timer = Timer(self.end - datetime.now(UTC), end_active_survey, client, self._id)
+
+    async def get_template(self) -> SurveyTemplate:
+        """Gets The Template With Its Questions From The Template Cache, Which Is Kept Up To Date With Any Changes"""
+        template_id = self.template if isinstance(self.template, int) else self.template._id
+        self.template = await SurveyTemplate.fetch(template_id, True)
+        return self.template
+
+    async def end_survey(self, client: discord.Client, message: discord.Message | None = None):
+        """
+        Marks The Survey As Ended And Disables The Button On Its Message
+        :param client: The client used to edit the message when it is not given
+        :param message: The message the survey was sent in, if it is already known
+        """
+        # Ended Surveys Are Kept For Their Responses But Drop Out Of The Running Surveys Index
+        sql = """UPDATE surveys.active_guild_surveys SET ended = true WHERE id=$1"""
+        await db.execute(sql, self._id)
+        if self._timer is not None:
+            await self._timer.cancel()
+        ACTIVE_SURVEY_CACHE.pop(self._id, None)
+
+        if message is None:
+            if self._message_id is None:
+                # Surveys Sent Before The Message Was Saved Can Not Be Edited
+                return
+            message = client.get_partial_messageable(self._channel_id).get_partial_message(self._message_id)
+        view = ActiveSurveyView(self)
+        view.disable_all_items()
+        template = await self.get_template()
+        try:
+            await message.edit(
+                embeds=[await ef.general("This Survey Has Ended"), await template.summary(self.end)], view=view
+            )
+        except discord.NotFound:
+            pass
 
+    async def take(self, interaction: discord.Interaction):
+        """
+        Checks If The User Can Take The Survey And Sends Them The Questions
+        :param interaction: The interaction from the user clicking the Take Survey button
+        """
+        start = perf_counter()
         # Check If Time Is Up On The Survey
-        if self.view.survey.end and self.view.survey.end < datetime.now():
-            await self.view.end_survey()
+        if self.end < datetime.now(UTC):
+            await self.end_survey(interaction.client, interaction.message)
             return await interaction.respond(embed=await ef.fail("Sorry! This Survey Has Ended"), ephemeral=True)
 
         # await interaction.response.defer()
 
-        # Get The Encrypted User ID
-        self.encrypted_user_id = await encrypt_id(interaction.user.id)
+        # Get The Encrypted User ID And The Template, Which Is Fetched If Needed
+        encrypted_user_id = await encrypt_id(interaction.user.id)
+        template = await self.get_template()
 
         # Check If The User Has Completed The Data Sharing Consent Form
-        sql = """SELECT version_id FROM surveys.data_sharing_consent WHERE user_id = $1 AND guild_id = $2;"""
-        if await db.fetchval(sql, str(interaction.user.id), str(interaction.guild_id)) != CONSENT_VERSION:
+        cached, consent_version = consent_cache.get(interaction.user.id, interaction.guild_id)
+        if cached and consent_version != CONSENT_VERSION:
             v = DataSharingConsent()
             return await interaction.respond(embed=v.embed, view=v, ephemeral=True)
 
-        # Fetch The Template If Needed
-        if isinstance(template, int):
-            self.view.survey.template = await SurveyTemplate.fetch(template, True)
-            template = self.view.survey.template
-        else:
-            await template.fill_questions()
+        eligibility = await db.fetch_one(
+            ELIGIBILITY,
+            str(interaction.user.id),
+            str(interaction.guild_id),
+            self._id,
+            encrypted_user_id,
+            not cached,
+            replica=False,
+        )
+
+        if not cached:
+            consent_version = eligibility["consent_version"]
+            consent_cache.set(interaction.user.id, interaction.guild_id, consent_version)
+            if consent_version != CONSENT_VERSION:
+                v = DataSharingConsent()
+                return await interaction.respond(embed=v.embed, view=v, ephemeral=True)
 
         # Check If The User Has Responded To The Survey The Maximum Number Of Times
-        sql = """SELECT DISTINCT max(response_num) FROM surveys.responses 
-                WHERE user_id=$2 and active_survey_id = $1;"""
-        times_taken = await db.fetchval(sql, int(self.view.survey._id), self.encrypted_user_id)
-        if times_taken is None:
-            times_taken = 0
+        times_taken = eligibility["times_taken"] or 0
         if times_taken >= template.entries_per_user:
             return await interaction.respond(
                 embed=await ef.fail(
@@ -131,28 +279,84 @@ class SurveyButton(discord.ui.Button):
                 ephemeral=True,
             )
 
-        # Check If The Maximum Number Of Survey Responses Has Been Reached
-        if template.max_entries is not None:
-            sql = """SELECT COUNT(*) FROM surveys.responses WHERE active_survey_id = $1;"""
-            total_responses = await db.fetchval(sql, self.view.survey._id)
-            if total_responses is None:
-                total_responses = 0
-            if total_responses >= template.max_entries:
-                await self.view.end_survey()
+        # Reserve One Of The Entries If There Is A Maximum. The Entry Is Released If The User Does Not Finish
+        reserved = template.max_entries is not None
+        if reserved and await db.fetchval(RESERVE_ENTRY, self._id, template.max_entries, replica=False) is None:
+            # The Reserved Entries Include Users Still Taking The Survey, So It Only Ends Once Enough Have Finished
+            if await db.fetchval(COMPLETED_ENTRIES, self._id, replica=False) >= template.max_entries:
+                await self.end_survey(interaction.client, interaction.message)
                 return await interaction.respond(
                     embed=await ef.fail("Sorry! This Survey Has Reached The Maximum Amount Of Entries"), ephemeral=True
                 )
+            return await interaction.respond(
+                embed=await ef.fail("Sorry! This Survey Is Full Right Now. Try Again In A Few Minutes"), ephemeral=True
+            )
 
+        # Only Time Spent Before The First Question Is Sent Is Recorded Since The Rest Waits On The User
+        CLICK_LATENCY.observe(perf_counter() - start)
         # Finally Send The Survey
-        await self.view.survey.template.send_questions(
-            interaction, self.encrypted_user_id, times_taken + 1, self.view.survey._id
-        )
+        session = SurveySession()
+        try:
+            await template.send_questions(interaction, encrypted_user_id, times_taken + 1, self._id, session)
+        finally:
+            # The Entry Is Kept Once The Submission Is Saved Even If Telling The User Failed
+            if reserved and not session.submitted:
+                await db.execute(RELEASE_ENTRY, self._id)
 
-    if TYPE_CHECKING:
 
-        @property
-        def view(self) -> ActiveSurveyView:
-            pass
+class ActiveSurveyView(discord.ui.View):
+    """
+    Only Renders The Take Survey Button. Clicks Are Handled By `route_survey_button`, So The View Is Stopped Right
+    Away And Is Never Stored By The Library
+    """
+
+    def __init__(self, survey: ActiveSurvey):
+        super().__init__(timeout=None)
+        self.add_item(SurveyButton(survey._id))
+        self.stop()
+
+
+class SurveyButton(discord.ui.Button):
+    def __init__(self, custom_id: int):
+        super().__init__(label="Take Survey", style=discord.ButtonStyle.blurple, custom_id=str(custom_id))
+
+
+async def get_active_survey(id: int) -> ActiveSurvey | None:
+    """
+    Gets A Running Survey From The Cache Or The Database
+    :param id: The ID of the active survey
+    :return: The survey or None if it does not exist or has ended
+    """
+    try:
+        return ACTIVE_SURVEY_CACHE[id]
+    except KeyError:
+        survey = await ActiveSurvey.fetch(id)
+        if survey is not None:
+            ACTIVE_SURVEY_CACHE[id] = survey
+        return survey
+
+
+async def route_survey_button(interaction: discord.Interaction) -> None:
+    """
+    Handles A Click On Any Take Survey Button. Survey Buttons Use The Active Survey ID As Their Custom ID, While
+    Custom IDs Generated By The Library Are 32 Characters Long
+    :param interaction: Any interaction received by the bot
+    """
+    if interaction.type != discord.InteractionType.component:
+        return
+    custom_id = interaction.custom_id or ""
+    if not custom_id.isdigit() or len(custom_id) >= 32:
+        return
+    survey = await get_active_survey(int(custom_id))
+    if survey is None:
+        return await interaction.respond(embed=await ef.fail("Sorry! This Survey Has Ended"), ephemeral=True)
+    await survey.take(interaction)
+
+
+async def end_active_survey(client: discord.Client, id: int) -> None:
+    survey = await get_active_survey(id)
+    if survey is not None:
+        await survey.end_survey(client)
 
 
 class DataSharingConsent(discord.ui.View):
@@ -175,14 +379,15 @@ class DataSharingConsent(discord.ui.View):
     @discord.ui.button(emoji="✅", label="Confirm", style=discord.ButtonStyle.success)
     async def confirm(self, button, interaction: discord.Interaction):
         await interaction.response.defer()
-        sql = (
-            "INSERT INTO surveys.data_sharing_consent (user_id, guild_id, timestamp, version_id) "
-            "VALUES ($1, $2, $3, $4) ON CONFLICT (user_id, guild_id) DO UPDATE SET version_id = excluded.version_id;"
-        )
         now = datetime.now(UTC)
         await db.execute(
-            sql, str(interaction.user.id), str(interaction.guild_id), now.replace(tzinfo=None), CONSENT_VERSION
+            CONSENT_UPSERT,
+            str(interaction.user.id),
+            str(interaction.guild_id),
+            now.replace(tzinfo=None),
+            CONSENT_VERSION,
         )
+        consent_cache.set(interaction.user.id, interaction.guild_id, CONSENT_VERSION)
         message = (
             f"Please Click The Button To Take The Survey Again!\n\nThis Form Was Completed By "
             f"{interaction.user.name} (`{interaction.user.id}`) In {interaction.guild.name} "
@@ -196,14 +401,24 @@ class DataSharingConsent(discord.ui.View):
         await interaction.edit(embed=await ef.general(message), view=None)
 
 
-async def load_active_surveys():
+async def reconcile_entries() -> None:
+    """Releases The Entries Reserved By Users That Were Still Taking A Survey When The Bot Stopped"""
+    await db.execute(RECONCILE_ENTRIES)
+
+
+async def load_active_surveys(client: discord.Client) -> list[int]:
+    """
+    Starts The Timers That End Every Running Survey And Caches As Many Of The Surveys As Fit
+    :param client: The client used to edit the survey messages when they end
+    :return: The template IDs of the running surveys
+    """
     sql = """SELECT "id", end_date, template_id, channel_id, message_id FROM surveys.active_guild_surveys
-    WHERE end_date > (NOW() AT TIME ZONE 'utc');"""
-    rows = await db.fetch(sql)
-    views = []
-    for row in rows:
-        s = await ActiveSurvey.load(row)
-        v = ActiveSurveyView(s)
-        await s.start_timer(v.end_survey)
-        views.append(v)
-    return views
+    WHERE NOT ended AND end_date > (NOW() AT TIME ZONE 'utc') ORDER BY end_date DESC;"""
+    rows = await db.fetch(sql, replica=False)
+    now = datetime.now(UTC)
+    for n, row in enumerate(rows):
+        Timer(row["end_date"].replace(tzinfo=UTC) - now, end_active_survey, client, row["id"])
+        # The Surveys Ending Last Are Most Likely To Still Be Clicked
+        if n < ACTIVE_SURVEY_CACHE.maxsize:
+            ACTIVE_SURVEY_CACHE[row["id"]] = await ActiveSurvey.load(row)
+    return [x["template_id"] for x in rows]
@@ -0,0 +1,137 @@
+from utils.database import database as db, Connection
+
+# The Upserts Are Shared By Adding New Responses And Rebuilding A Template. `{source}` Picks The Answers To Count.
+# Rows Are Upserted In Key Order So Concurrent Transactions Always Lock Them In The Same Order And Cannot Deadlock
+# Migration 0005 Backfills Existing Responses With A Copy Of These, So Keep Them In Step When Changing The Aggregates
+UPSERT_TEMPLATE = """INSERT INTO surveys.template_aggregates AS a (template_id, responses)
+    SELECT template_id, COUNT(*) FROM surveys.responses WHERE {source}
+    GROUP BY template_id ORDER BY template_id
+    ON CONFLICT (template_id) DO UPDATE SET responses = a.responses + EXCLUDED.responses;"""
+
+# Text And Date Questions Save An Empty String When An Optional Question Is Skipped. Dates Are Compared By A Number
+# Worked Out From The Date Type Stored In The Question Data. The Type Can Be Changed After Answers Exist, So Each Cast
+# Checks The Format First And Answers Stored In Another Format Are Left Out Of The Earliest And Latest
+UPSERT_QUESTIONS = """INSERT INTO surveys.question_aggregates AS a
+        (question, answered, min_value, min_key, max_value, max_key, total_length, min_length, max_length)
+    SELECT question,
+        COUNT(*) FILTER (WHERE value IS DISTINCT FROM ''),
+        (array_agg(value ORDER BY key) FILTER (WHERE key IS NOT NULL))[1], MIN(key),
+        (array_agg(value ORDER BY key DESC) FILTER (WHERE key IS NOT NULL))[1], MAX(key),
+        COALESCE(SUM(length), 0),
+        MIN(length) FILTER (WHERE length > 0),
+        MAX(length) FILTER (WHERE length > 0)
+    FROM (
+        SELECT qr.question, v.value,
+            CASE WHEN q.type = 2 THEN
+                CASE (q.question_data->>'type')::int
+                    WHEN 1 THEN CASE WHEN v.value ~ '^[0-9]{{4}}-[0-9]{{2}}-[0-9]{{2}}$'
+                        THEN extract(epoch FROM v.value::date)::float8 END
+                    WHEN 2 THEN CASE
+                        WHEN v.value ~ '^[0-9]{{2}}:[0-9]{{2}}(:[0-9]{{2}}([.][0-9]+)?)?([+-][0-9]{{2}}:[0-9]{{2}})?$'
+                        THEN extract(epoch FROM v.value::timetz)::float8 END
+                    ELSE CASE WHEN v.value ~ '^-?[0-9]+([.][0-9]+)?(e[-+]?[0-9]+)?$'
+                        THEN v.value::float8 END
+                END
+            END AS key,
+            CASE WHEN q.type = 0 THEN char_length(v.value) END AS length
+        FROM surveys.question_response AS qr JOIN surveys.questions AS q ON q.id = qr.question
+            CROSS JOIN LATERAL (
+                SELECT COALESCE(qr.response_data->>'text', qr.response_data->>'timestamp') AS value
+            ) AS v
+        WHERE {source}
+    ) AS answers
+    GROUP BY question ORDER BY question
+    ON CONFLICT (question) DO UPDATE SET
+        answered = a.answered + EXCLUDED.answered,
+        min_value = CASE WHEN a.min_key IS NULL OR EXCLUDED.min_key < a.min_key
+            THEN EXCLUDED.min_value ELSE a.min_value END,
+        min_key = LEAST(a.min_key, EXCLUDED.min_key),
+        max_value = CASE WHEN a.max_key IS NULL OR EXCLUDED.max_key > a.max_key
+            THEN EXCLUDED.max_value ELSE a.max_value END,
+        max_key = GREATEST(a.max_key, EXCLUDED.max_key),
+        total_length = a.total_length + EXCLUDED.total_length,
+        min_length = LEAST(a.min_length, EXCLUDED.min_length),
+        max_length = GREATEST(a.max_length, EXCLUDED.max_length);"""
+
+UPSERT_OPTIONS = """INSERT INTO surveys.option_aggregates AS a (question, option, count)
+    SELECT qr.question, selected.option::int, COUNT(*)
+    FROM surveys.question_response AS qr JOIN surveys.questions AS q ON q.id = qr.question
+        CROSS JOIN LATERAL jsonb_array_elements_text(qr.response_data->'selected') AS selected(option)
+    WHERE {source}
+    GROUP BY 1, 2 ORDER BY 1, 2
+    ON CONFLICT (question, option) DO UPDATE SET count = a.count + EXCLUDED.count;"""
+
+# Adding Only Uses The Primary Keys Of The Responses That Were Just Written
+ADD_TEMPLATE = db.statement("add_template_aggregates", UPSERT_TEMPLATE.format(source="id = ANY($1::int[])"))
+ADD_QUESTIONS = db.statement("add_question_aggregates", UPSERT_QUESTIONS.format(source="qr.response = ANY($1::int[])"))
+ADD_OPTIONS = db.statement("add_option_aggregates", UPSERT_OPTIONS.format(source="qr.response = ANY($1::int[])"))
+
+CLEAR_TEMPLATE = db.statement(
+    "clear_template_aggregates",
+    """DELETE FROM surveys.template_aggregates WHERE template_id = $1;""",
+)
+CLEAR_QUESTIONS = db.statement(
+    "clear_question_aggregates",
+    """DELETE FROM surveys.question_aggregates
+    WHERE question IN (SELECT id FROM surveys.questions WHERE survey_id = $1);""",
+)
+CLEAR_OPTIONS = db.statement(
+    "clear_option_aggregates",
+    """DELETE FROM surveys.option_aggregates
+    WHERE question IN (SELECT id FROM surveys.questions WHERE survey_id = $1);""",
+)
+REBUILD_TEMPLATE = db.statement("rebuild_template_aggregates", UPSERT_TEMPLATE.format(source="template_id = $1"))
+REBUILD_QUESTIONS = db.statement("rebuild_question_aggregates", UPSERT_QUESTIONS.format(source="q.survey_id = $1"))
+REBUILD_OPTIONS = db.statement("rebuild_option_aggregates", UPSERT_OPTIONS.format(source="q.survey_id = $1"))
+
+ALL_TEMPLATE_IDS = db.statement("all_template_ids", """SELECT id FROM surveys.template ORDER BY id;""")
+
+QUESTION_AGGREGATES = db.statement(
+    "question_aggregates",
+    """SELECT q.id AS question, COALESCE(t.responses, 0) AS total, COALESCE(a.answered, 0) AS answered,
+        a.min_value, a.max_value, COALESCE(a.total_length, 0) AS total_length, a.min_length, a.max_length
+    FROM surveys.questions AS q
+        LEFT JOIN surveys.question_aggregates AS a ON a.question = q.id
+        LEFT JOIN surveys.template_aggregates AS t ON t.template_id = q.survey_id
+    WHERE q.survey_id = $1;""",
+)
+OPTION_AGGREGATES = db.statement(
+    "option_aggregates",
+    """SELECT question, option, count FROM surveys.option_aggregates WHERE question = ANY($1::int[]);""",
+)
+
+
+async def add_responses(conn: Connection, response_ids: list[int]) -> None:
+    """
+    Adds Newly Written Responses To The Aggregates
+    :param conn: The connection the responses were written with. This should be the same transaction
+    :param response_ids: The IDs of the responses
+    """
+    await ADD_TEMPLATE.execute(conn, response_ids)
+    await ADD_QUESTIONS.execute(conn, response_ids)
+    await ADD_OPTIONS.execute(conn, response_ids)
+
+
+async def rebuild_aggregates(template_id: int) -> None:
+    """
+    Recounts The Aggregates Of A Template From All Of Its Responses
+    :param template_id: The ID of the template
+    """
+    async with db.transaction() as conn:
+        await CLEAR_TEMPLATE.execute(conn, template_id)
+        await CLEAR_QUESTIONS.execute(conn, template_id)
+        await CLEAR_OPTIONS.execute(conn, template_id)
+        await REBUILD_TEMPLATE.execute(conn, template_id)
+        await REBUILD_QUESTIONS.execute(conn, template_id)
+        await REBUILD_OPTIONS.execute(conn, template_id)
+
+
+async def rebuild_all_aggregates() -> int:
+    """
+    Recounts The Aggregates Of Every Template. Each Template Is Rebuilt In Its Own Transaction
+    :return: The number of templates rebuilt
+    """
+    template_ids = [x["id"] for x in await db.fetch(ALL_TEMPLATE_IDS, replica=False)]
+    for template_id in template_ids:
+        await rebuild_aggregates(template_id)
+    return len(template_ids)
@@ -0,0 +1,106 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import re
+import tempfile
+from typing import IO
+
+from forms.survey.template import SurveyTemplate
+from questions.survey_question import SurveyQuestion
+from utils.database import database as db
+
+# Ordered By Response So All The Answers Of A Response Arrive Together
+EXPORT_ROWS = """SELECT r.id, r.response_num, qr.question, qr.response_data
+FROM surveys.responses AS r LEFT JOIN surveys.question_response AS qr ON qr.response = r.id
+WHERE r.template_id = $1
+ORDER BY r.id;"""
+
+# Rows Fetched From The Cursor And Responses Written To The File At A Time
+EXPORT_CHUNK_SIZE = 500
+
+
+class ResponseWriter:
+    """Writes One Line Per Response To A Text File In CSV Or JSON Lines Format"""
+
+    def __init__(self, file: IO[str], file_format: str, headers: list[str]):
+        self.file = file
+        self.file_format = file_format
+        self.headers = headers
+        if file_format == "csv":
+            self._csv = csv.writer(file)
+            self._csv.writerow(headers)
+
+    def write(self, responses: list[list]) -> None:
+        if self.file_format == "csv":
+            self._csv.writerows(responses)
+        else:
+            self.file.writelines(json.dumps(dict(zip(self.headers, x)), ensure_ascii=False) + "\n" for x in responses)
+
+
+async def _render(questions: list[SurveyQuestion], responses: list[tuple[int, int, dict[int, dict]]]) -> list[list]:
+    rows = [[response_id, response_num] for response_id, response_num, _ in responses]
+    for question in questions:
+        # Each Question Renders Its Answers For The Whole Chunk In One Batch
+        answered = [i for i, x in enumerate(responses) if question._id in x[2]]
+        column = [""] * len(responses)
+        for i, text in zip(answered, await question.view_responses([responses[i][2][question._id] for i in answered])):
+            column[i] = text
+        for row, value in zip(rows, column):
+            row.append(value)
+    return rows
+
+
+async def export_responses(
+    template: SurveyTemplate, questions: list[SurveyQuestion], file_format: str = "csv", compress: bool = True
+) -> tuple[IO[bytes], str, int]:
+    """
+    Streams Every Response To A Template Into A Temporary File With One Row Per Response And One Column Per Question
+    :param template: The template to export
+    :param questions: The questions of the template
+    :param file_format: Either `csv` or `jsonl`
+    :param compress: If the file should be compressed with gzip
+    :return: The file positioned at the start, its name and its size in bytes
+    """
+    questions = sorted(questions, key=lambda x: x.position)
+    headers = ["response_id", "response_num"] + [f"{q.position + 1}. {q.title}" for q in questions]
+
+    file = tempfile.TemporaryFile()
+    raw = gzip.GzipFile(fileobj=file, mode="wb") if compress else file
+    text = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+    writer = ResponseWriter(text, file_format, headers)
+
+    pending: list[tuple[int, int, dict[int, dict]]] = []
+    current: tuple[int, int, dict[int, dict]] | None = None
+    try:
+        # A Cursor Keeps Only One Chunk Of Rows In Memory. It Has To Run Inside A Transaction
+        async with db.acquire(replica=True) as conn:
+            async with conn.transaction(readonly=True):
+                async for row in conn.cursor(EXPORT_ROWS, template._id, prefetch=EXPORT_CHUNK_SIZE):
+                    if current is None or current[0] != row["id"]:
+                        if current is not None:
+                            pending.append(current)
+                        current = (row["id"], row["response_num"], {})
+                    if row["question"] is not None:
+                        current[2][row["question"]] = row["response_data"]
+                    if len(pending) >= EXPORT_CHUNK_SIZE:
+                        # Compressing And Writing Happens Off The Event Loop
+                        await asyncio.to_thread(writer.write, await _render(questions, pending))
+                        pending = []
+        if current is not None:
+            pending.append(current)
+        await asyncio.to_thread(writer.write, await _render(questions, pending))
+
+        text.flush()
+        text.detach()
+        if compress:
+            raw.close()
+    except BaseException:
+        file.close()
+        raise
+
+    size = file.tell()
+    file.seek(0)
+    name = re.sub(r"[^\w\-]+", "_", template.title).strip("_") or "survey"
+    return file, f"{name}.{file_format}{'.gz' if compress else ''}", size
@@ -0,0 +1,322 @@
+import asyncio
+import json
+import os
+import traceback
+from time import perf_counter
+
+from forms.survey.aggregates import add_responses
+from utils.database import database as db, Connection, CONNECTION_ERRORS
+
+INSERT_RESPONSE = db.statement(
+    "insert_response",
+    """INSERT INTO surveys.responses (user_id, response_num, active_survey_id, template_id)
+                    VALUES ($1, $2, $3, $4) RETURNING id;""",
+)
+INSERT_RESPONSE_WITH_ID = db.statement(
+    "insert_response_with_id",
+    """INSERT INTO surveys.responses (id, user_id, response_num, active_survey_id, template_id)
+                    VALUES ($1, $2, $3, $4, $5);""",
+)
+RESERVE_RESPONSE_IDS = db.statement(
+    "reserve_response_ids",
+    """SELECT nextval(pg_get_serial_sequence('surveys.responses', 'id')) FROM generate_series(1, $1);""",
+)
+INSERT_QUESTION_RESPONSE = db.statement(
+    "insert_question_response",
+    """INSERT INTO surveys.question_response (response, question, response_data) VALUES ($1, $2, $3);""",
+)
+
+
+class Submission:
+    """
+    A Completed Response To A Survey That Has Not Been Written To The Database Yet
+
+    Attributes
+    ----------
+    user_id: str
+        The encrypted ID of the user that took the survey.
+    response_num: int
+        How many times the user has taken the survey including this time.
+    active_id: int
+        The ID of the active survey that was taken.
+    template_id: int
+        The ID of the template of the survey.
+    rows: list[tuple]
+        The (response, question, response_data) rows of each answered question. The response ID is filled in when
+        the submission is written.
+    """
+
+    def __init__(self, user_id: str, response_num: int, active_id: int, template_id: int, rows: list[tuple]):
+        self.user_id = user_id
+        self.response_num = response_num
+        self.active_id = active_id
+        self.template_id = template_id
+        self.rows = rows
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "user_id": self.user_id,
+                "response_num": self.response_num,
+                "active_id": self.active_id,
+                "template_id": self.template_id,
+                "rows": [[x[1], x[2]] for x in self.rows],
+            }
+        )
+
+    @classmethod
+    def from_json(cls, line: str):
+        data = json.loads(line)
+        rows = [(None, question, response_data) for question, response_data in data["rows"]]
+        return cls(data["user_id"], data["response_num"], data["active_id"], data["template_id"], rows)
+
+
+async def write_submissions(conn: Connection, submissions: list[Submission]) -> None:
+    """
+    Writes Submissions To The Responses Tables And Adds Them To The Aggregates Using A Constant Number Of Round Trips
+    :param conn: The connection to use. This should be inside a transaction
+    :param submissions: The submissions to write
+    """
+    if len(submissions) == 1:
+        s = submissions[0]
+        ids = [await INSERT_RESPONSE.fetchval(conn, s.user_id, s.response_num, s.active_id, s.template_id)]
+    else:
+        ids = [x[0] for x in await RESERVE_RESPONSE_IDS.fetch(conn, len(submissions))]
+        await INSERT_RESPONSE_WITH_ID.executemany(
+            conn,
+            [(i, s.user_id, s.response_num, s.active_id, s.template_id) for i, s in zip(ids, submissions)],
+        )
+
+    rows = [(i, question, data) for i, s in zip(ids, submissions) for _, question, data in s.rows]
+    if rows:
+        await INSERT_QUESTION_RESPONSE.executemany(conn, rows)
+    await add_responses(conn, ids)
+
+
+class ResponseQueue:
+    """
+    An Optional Write Behind Queue For Submissions
+
+    Submissions are appended to a local journal file and synced to disk before the user is told they completed the
+    survey, then a background task writes them to the database in large batches. After each batch a checkpoint file
+    records the offset in the journal of the first submission that is still pending, and the journal is emptied once
+    nothing is pending. On start up every submission after the checkpoint is replayed so no submission is lost if the
+    bot stops. A crash in the moment between a batch committing and the checkpoint being written can cause that batch
+    to be written twice.
+
+    When a batch fails for a reason other than the database being unreachable, its submissions are written one at a
+    time and any that still fail, such as a submission for a survey that was deleted, are moved to a dead letter file
+    next to the journal so they do not hold up the rest of the queue.
+
+    Submissions that are still queued are not counted by the entries per user or maximum entries checks.
+    """
+
+    def __init__(self):
+        self.enabled: bool = False
+        self.journal_path: str = "responses.journal"
+        self.batch_size: int = 500
+        self.flush_interval: float = 1.0
+
+        self._pending: list[Submission] = []
+        # The Offset In The Journal Where Each Pending Submission Ends
+        self._ends: list[int] = []
+        self._journal = None
+        self._journal_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+
+        self.submitted: int = 0
+        self.written: int = 0
+        self.batches: int = 0
+        self.failures: int = 0
+        self.dead_letters: int = 0
+        self.last_flush_time: float = 0.0
+
+    def configure(
+        self, enabled: bool = False, journal: str = "responses.journal", batch_size: int = 500, flush_interval=1.0
+    ) -> None:
+        """
+        Sets The Queue Options From The Config
+        :param enabled: If submissions should go through the queue instead of being written immediately
+        :param journal: The path of the journal file. The checkpoint is kept next to it
+        :param batch_size: The most submissions to write in one transaction
+        :param flush_interval: Seconds to wait between writing batches when the queue is not full
+        """
+        self.enabled = enabled
+        self.journal_path = journal
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    @property
+    def checkpoint_path(self) -> str:
+        return self.journal_path + ".checkpoint"
+
+    @property
+    def dead_letter_path(self) -> str:
+        return self.journal_path + ".dead"
+
+    async def start(self) -> None:
+        """Replays The Journal From A Previous Run And Starts Writing Batches"""
+        if not self.enabled or self._task is not None:
+            return
+        self._pending, self._ends = await asyncio.to_thread(self._open_journal)
+        if self._pending:
+            print(f"Replaying {len(self._pending)} Journaled Submissions")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops The Background Task And Writes Everything That Is Still Pending"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._task = None
+        try:
+            while self._pending:
+                await self.flush()
+        except Exception as e:
+            # The Submissions Stay In The Journal And Are Replayed On The Next Start
+            print(f"Could Not Write {len(self._pending)} Queued Submissions Before Stopping: {e}")
+        finally:
+            self._journal.close()
+
+    async def put(self, submission: Submission) -> None:
+        """
+        Journals A Submission And Queues It To Be Written
+        :param submission: The submission to write
+        """
+        line = (submission.to_json() + "\n").encode()
+        # The Lock Keeps The Pending List In The Same Order As The Journal
+        async with self._journal_lock:
+            end = await asyncio.to_thread(self._append, line)
+            self._pending.append(submission)
+            self._ends.append(end)
+        self.submitted += 1
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                while self._pending:
+                    await self.flush()
+            except Exception:
+                # The Submissions Stay Journaled And Are Retried On The Next Interval
+                self.failures += 1
+                print("Writing Queued Submissions Failed")
+                traceback.print_exc()
+                await asyncio.sleep(self.flush_interval)
+
+    async def flush(self) -> None:
+        """Writes One Batch Of Pending Submissions In A Single Transaction"""
+        async with self._flush_lock:
+            batch = self._pending[: self.batch_size]
+            if not batch:
+                return
+            start = perf_counter()
+            try:
+                async with db.transaction() as conn:
+                    await write_submissions(conn, batch)
+            except CONNECTION_ERRORS:
+                raise
+            except Exception as e:
+                print(f"Writing A Batch Of {len(batch)} Submissions Failed, Retrying One At A Time: {e!r}")
+                await self._flush_individually(batch)
+            else:
+                await self._advance(batch, [])
+            self.batches += 1
+            self.last_flush_time = perf_counter() - start
+
+    async def _flush_individually(self, batch: list[Submission]) -> None:
+        done = 0
+        dead: list[Submission] = []
+        try:
+            for submission in batch:
+                try:
+                    async with db.transaction() as conn:
+                        await write_submissions(conn, [submission])
+                except CONNECTION_ERRORS:
+                    raise
+                except Exception as e:
+                    print(f"Moving A Submission For Template {submission.template_id} To The Dead Letter File: {e!r}")
+                    dead.append(submission)
+                done += 1
+        finally:
+            # Submissions That Were Handled Are Checkpointed Even If The Database Went Away Part Way Through
+            if done:
+                await self._advance(batch[:done], dead)
+
+    async def _advance(self, handled: list[Submission], dead: list[Submission]) -> None:
+        # Removes Submissions From The Front Of The Queue Once They Are Written Or Dead Lettered
+        async with self._journal_lock:
+            if dead:
+                await asyncio.to_thread(self._dead_letter, dead)
+            end = self._ends[len(handled) - 1]
+            del self._pending[: len(handled)]
+            del self._ends[: len(handled)]
+            await asyncio.to_thread(self._checkpoint, end if self._pending else None)
+        self.written += len(handled) - len(dead)
+        self.dead_letters += len(dead)
+
+    # The Methods Below Do Blocking File Work And Are Run In A Thread
+
+    def _open_journal(self) -> tuple[list[Submission], list[int]]:
+        self._journal = open(self.journal_path, "ab+")
+        try:
+            with open(self.checkpoint_path) as checkpoint:
+                offset = int(checkpoint.read())
+        except (FileNotFoundError, ValueError):
+            offset = 0
+
+        pending, ends = [], []
+        self._journal.seek(offset)
+        for line in self._journal:
+            if not line.endswith(b"\n"):
+                # A Write Cut Off By A Crash. The User Was Never Told It Was Saved
+                self._journal.truncate(offset)
+                break
+            offset += len(line)
+            if line.strip():
+                pending.append(Submission.from_json(line.decode()))
+                ends.append(offset)
+        return pending, ends
+
+    def _dead_letter(self, submissions: list[Submission]) -> None:
+        with open(self.dead_letter_path, "a") as file:
+            file.writelines(x.to_json() + "\n" for x in submissions)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def _append(self, line: bytes) -> int:
+        # Reading The Journal Or Emptying It Moves The Position, So It Is Moved Back To The End To Get The Offset
+        self._journal.seek(0, os.SEEK_END)
+        self._journal.write(line)
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        return self._journal.tell()
+
+    def _checkpoint(self, offset: int | None) -> None:
+        # None Means Nothing Is Pending, So The Journal Is Emptied. The Checkpoint Is Reset First So A Crash In Between
+        # Can Only Replay Submissions Again Rather Than Skip New Ones
+        temp_path = self.checkpoint_path + ".tmp"
+        with open(temp_path, "w") as checkpoint:
+            checkpoint.write(str(offset or 0))
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+        os.replace(temp_path, self.checkpoint_path)
+        if offset is None:
+            self._journal.truncate(0)
+            self._journal.seek(0)
+            os.fsync(self._journal.fileno())
+
+
+response_queue = ResponseQueue()
@@ -0,0 +1,360 @@
+import asyncio
+
+import discord
+from discord.ext import pages
+
+from forms.survey.aggregates import OPTION_AGGREGATES, QUESTION_AGGREGATES
+from questions.datetime_question import DateQuestion
+from questions.multiple_choice import MultipleChoice
+from questions.survey_question import SurveyQuestion
+from questions.text_question import TextQuestion
+from utils.database import database as db
+from utils import embed_factory as ef
+
+HAS_RESPONSES = db.statement(
+    "has_responses", """SELECT EXISTS (SELECT 1 FROM surveys.responses WHERE template_id = $1);"""
+)
+# Responses Are Paged By Their ID So Each Chunk Starts After The Last ID Of The Previous One
+QUESTION_RESPONSES_PAGE = db.statement(
+    "question_responses_page",
+    """SELECT response, response_data FROM surveys.question_response
+    WHERE question = $1 AND response > $2 ORDER BY response LIMIT $3;""",
+)
+RESPONSES_PAGE = db.statement(
+    "responses_page",
+    """SELECT r.id, qr.question, qr.response_data
+    FROM (
+        SELECT id FROM surveys.responses WHERE template_id = $1 AND id > $2 ORDER BY id LIMIT $3
+    ) AS r LEFT JOIN surveys.question_response AS qr ON qr.response = r.id
+    ORDER BY r.id;""",
+)
+
+# Discord Allows 10 Embeds Per Message But Only 6000 Characters Across All Of Them
+MAX_PAGE_EMBEDS = 10
+MAX_PAGE_CHARACTERS = 6000
+
+
+class QuestionSummary:
+    """
+    The Aggregated Responses To One Question
+
+    Attributes
+    ----------
+    question: SurveyQuestion
+        The question that was summarized.
+    total: int
+        The number of responses to the survey.
+    answered: int
+        The number of responses that answered this question.
+    options: dict[int, int]
+        How many times each option was selected, by option ID. Only used for multiple choice questions.
+    earliest: str | None
+        The earliest answer formatted for Discord. Only used for date questions.
+    latest: str | None
+        The latest answer formatted for Discord. Only used for date questions.
+    total_length: int
+        The combined length of every answer. Only used for text questions.
+    min_length: int | None
+        The length of the shortest answer. Only used for text questions.
+    max_length: int | None
+        The length of the longest answer. Only used for text questions.
+    """
+
+    def __init__(self, question: SurveyQuestion, total: int = 0, answered: int = 0):
+        self.question = question
+        self.total = total
+        self.answered = answered
+        self.options: dict[int, int] = {}
+        self.earliest: str | None = None
+        self.latest: str | None = None
+        self.total_length: int = 0
+        self.min_length: int | None = None
+        self.max_length: int | None = None
+
+    @property
+    def skipped(self) -> int:
+        return max(self.total - self.answered, 0)
+
+    def embed(self) -> discord.Embed:
+        q = self.question
+        skip_rate = self.skipped / self.total if self.total else 0
+        lines = [f"Answered By **{self.answered}** Of **{self.total}** Responses ({skip_rate:.0%} Skipped)"]
+        if isinstance(q, MultipleChoice):
+            for option in q.options:
+                count = self.options.get(option.id, 0)
+                share = count / self.answered if self.answered else 0
+                lines.append(
+                    f"- {discord.utils.escape_markdown(option.text)}: **{count}** ({share:.0%}) "
+                    f"{'█' * round(share * 10)}"
+                )
+        elif isinstance(q, DateQuestion) and self.earliest is not None:
+            lines.append(f"Earliest: {self.earliest}\nLatest: {self.latest}")
+        elif isinstance(q, TextQuestion) and self.answered:
+            lines.append(
+                f"Average Length: **{self.total_length / self.answered:.0f}** Characters "
+                f"(Shortest {self.min_length}, Longest {self.max_length})"
+            )
+        return discord.Embed(title=f"{q.position + 1}. {q.title}"[:256], description="\n".join(lines)[:4096])
+
+
+async def summarize(template_id: int, questions: list[SurveyQuestion]) -> list[QuestionSummary]:
+    """
+    Reads The Aggregates Of Every Question, Which Are Kept Up To Date As Responses Are Written
+    :param template_id: The ID of the template
+    :param questions: The questions of the template
+    :return: A summary for each question in order
+    """
+    summaries = {q._id: QuestionSummary(q) for q in questions}
+    for row in await db.fetch(QUESTION_AGGREGATES, template_id):
+        summary = summaries.get(row["question"])
+        if summary is None:
+            continue
+        summary.total = row["total"]
+        summary.answered = row["answered"]
+        summary.total_length = row["total_length"]
+        summary.min_length = row["min_length"]
+        summary.max_length = row["max_length"]
+        if isinstance(summary.question, DateQuestion) and row["min_value"] is not None:
+            summary.earliest, summary.latest = await summary.question.view_responses(
+                [{"timestamp": row["min_value"]}, {"timestamp": row["max_value"]}]
+            )
+
+    choice_ids = [q._id for q in questions if isinstance(q, MultipleChoice)]
+    if choice_ids:
+        for row in await db.fetch(OPTION_AGGREGATES, choice_ids):
+            summaries[row["question"]].options[row["option"]] = row["count"]
+    return sorted(summaries.values(), key=lambda x: x.question.position)
+
+
+def summary_pages(summaries: list[QuestionSummary]) -> list[pages.Page]:
+    """Fits As Many Question Summaries On Each Page As Discord Allows"""
+    result = []
+    embeds: list[discord.Embed] = []
+    for summary in summaries:
+        e = summary.embed()
+        if embeds and (len(embeds) == MAX_PAGE_EMBEDS or sum(map(len, embeds)) + len(e) > MAX_PAGE_CHARACTERS):
+            result.append(pages.Page(embeds=embeds))
+            embeds = []
+        embeds.append(e)
+    if embeds:
+        result.append(pages.Page(embeds=embeds))
+    return result
+
+
+class PageSource:
+    """
+    Loads The Pages Of A Paginator A Chunk Of Rows At A Time Using Keyset Pagination
+
+    Attributes
+    ----------
+    label: str
+        The name of the source in the paginator menu.
+    description: str | None
+        The description of the source in the paginator menu.
+    pages: list[list[discord.Embed]]
+        The pages that have been loaded so far.
+    exhausted: bool
+        If every page has been loaded.
+    """
+
+    def __init__(self, label: str, description: str | None = None, chunk_size: int = 100):
+        self.label = label
+        self.description = description
+        self.chunk_size = chunk_size
+        self.pages: list[list[discord.Embed]] = []
+        self.exhausted: bool = False
+        self._after: int = 0
+        self._lock = asyncio.Lock()
+
+    async def _fetch(self, after: int) -> tuple[list[list[discord.Embed]], int, bool]:
+        """
+        Loads The Next Chunk Of Rows And Renders Them
+        :param after: The key of the last row that was loaded. Rows after it are loaded
+        :return: The new pages, the key of the last row and if there are no more rows
+        """
+        raise NotImplementedError
+
+    async def _empty_page(self) -> list[discord.Embed]:
+        raise NotImplementedError
+
+    async def load_more(self) -> None:
+        async with self._lock:
+            if self.exhausted:
+                return
+            new_pages, self._after, self.exhausted = await self._fetch(self._after)
+            self.pages.extend(new_pages)
+            if self.exhausted and not self.pages:
+                self.pages.append(await self._empty_page())
+
+    async def get_page(self, index: int) -> list[discord.Embed] | None:
+        while index >= len(self.pages) and not self.exhausted:
+            await self.load_more()
+        return self.pages[index] if index < len(self.pages) else None
+
+
+class QuestionPageSource(PageSource):
+    """The Answers To One Question"""
+
+    def __init__(self, question: SurveyQuestion, chunk_size: int = 200):
+        super().__init__(question.title, question.description, chunk_size)
+        self.question = question
+        self._question_embed: discord.Embed | None = None
+
+    async def _fetch(self, after: int) -> tuple[list[list[discord.Embed]], int, bool]:
+        rows = await db.fetch(QUESTION_RESPONSES_PAGE, self.question._id, after, self.chunk_size)
+        if self._question_embed is None:
+            self._question_embed = await self.question.display()
+
+        result = []
+        e = discord.Embed(title="Responses", description="")
+        for r in await self.question.view_responses([row["response_data"] for row in rows]):
+            if len(r) == 0:
+                continue
+            response = "- " + discord.utils.escape_markdown(r)
+            if len(e.description) != 0 and len(e) + len(response) > 1024:
+                result.append([self._question_embed, e])
+                e = discord.Embed(title="Responses", description="")
+            e.description += response + "\n"
+        if len(e.description) != 0:
+            result.append([self._question_embed, e])
+        return result, rows[-1]["response"] if rows else after, len(rows) < self.chunk_size
+
+    async def _empty_page(self) -> list[discord.Embed]:
+        return [
+            self._question_embed or await self.question.display(),
+            await ef.general(
+                "There Are No Responses To This Question",
+                message="This Question Was Optional And No One Answered It!",
+            ),
+        ]
+
+
+class ResponsePageSource(PageSource):
+    """Every Answer Of Each Response To A Template"""
+
+    def __init__(self, template_id: int, questions: list[SurveyQuestion], chunk_size: int = 10):
+        super().__init__("By Response", chunk_size=chunk_size)
+        self.template_id = template_id
+        self.question_map = {q._id: q for q in questions}
+        self.count: int = 0
+
+    async def _fetch(self, after: int) -> tuple[list[list[discord.Embed]], int, bool]:
+        rows = await db.fetch(RESPONSES_PAGE, self.template_id, after, self.chunk_size)
+        responses: dict[int, list] = {}
+        by_question: dict[int, list] = {}
+        for row in rows:
+            answers = responses.setdefault(row["id"], [])
+            if row["question"] in self.question_map:
+                answers.append(self.question_map[row["question"]])
+                by_question.setdefault(row["question"], []).append((row["id"], row["response_data"]))
+
+        # Every Answer To A Question In The Chunk Is Rendered In One Batch
+        rendered: dict[tuple[int, int], str] = {}
+        headings: dict[int, str] = {}
+        for question_id, answers in by_question.items():
+            question = self.question_map[question_id]
+            texts = await question.view_responses([x[1] for x in answers])
+            rendered.update(((x[0], question_id), text) for x, text in zip(answers, texts))
+            headings[question_id] = f"**Question {question.position + 1}:** {await question.short_display()}"
+
+        result = []
+        for response_id, answers in responses.items():
+            self.count += 1
+            response_embed = discord.Embed(title=f"Response {self.count}", description=f"ID: {response_id}")
+            e = discord.Embed(title="Responses", description="")
+            for question in sorted(answers, key=lambda x: x.position):
+                r = rendered[(response_id, question._id)]
+                if len(r) == 0:
+                    continue
+                response_text = headings[question._id]
+                response_text += "\n- " + discord.utils.escape_markdown(r)
+                if len(e.description) != 0 and len(e) + len(response_text) > 1024:
+                    result.append([response_embed, e])
+                    e = discord.Embed(title="Responses", description="")
+                e.description += response_text + "\n"
+            # If the survey only has option questions and all questions were skipped nothing is shown
+            if len(e.description) != 0:
+                result.append([response_embed, e])
+        return result, max(responses, default=after), len(responses) < self.chunk_size
+
+    async def _empty_page(self) -> list[discord.Embed]:
+        return [await ef.general("There Are No Responses To Show", message="Every Question Was Skipped")]
+
+
+class LazyPaginator(discord.ui.View):
+    """
+    A Paginator That Only Renders The Page Being Viewed And Loads The Next Chunk Before It Is Needed
+
+    Unlike `pages.Paginator` nothing is built up front, so the first page takes the same time no matter how many
+    responses there are.
+    """
+
+    # Start Loading The Next Chunk When The User Is This Many Pages From The End Of What Is Loaded
+    PREFETCH_DISTANCE = 2
+
+    def __init__(self, sources: list[PageSource]):
+        super().__init__(timeout=840, disable_on_timeout=True)
+        self.sources = sources
+        self.source = sources[0]
+        self.index = 0
+        self._prefetch: asyncio.Task | None = None
+        if len(sources) > 1:
+            select = discord.ui.Select(
+                placeholder="Select A Question",
+                options=[
+                    discord.SelectOption(label=x.label[:100], description=(x.description or None), value=str(n))
+                    for n, x in enumerate(sources)
+                ],
+                row=1,
+            )
+            select.callback = self.select_source
+            self.add_item(select)
+
+    def _update_buttons(self) -> None:
+        self.previous.disabled = self.index == 0
+        self.next.disabled = self.source.exhausted and self.index >= len(self.source.pages) - 1
+        total = f"/{len(self.source.pages)}" if self.source.exhausted else ""
+        self.counter.label = f"{self.index + 1}{total}"
+
+    def _start_prefetch(self) -> None:
+        if self.source.exhausted or self.index < len(self.source.pages) - self.PREFETCH_DISTANCE:
+            return
+        if self._prefetch is None or self._prefetch.done():
+            self._prefetch = asyncio.create_task(self.source.load_more())
+
+    async def _page(self) -> list[discord.Embed]:
+        page = await self.source.get_page(self.index)
+        if page is None:
+            # The Page Count Was Not Known Until The Last Chunk Loaded
+            self.index = len(self.source.pages) - 1
+            page = self.source.pages[self.index]
+        self._update_buttons()
+        self._start_prefetch()
+        return page
+
+    async def respond(self, ctx: discord.ApplicationContext) -> None:
+        page = await self._page()
+        self.message = await ctx.respond(embeds=page, view=self, ephemeral=True)
+
+    async def show(self, interaction: discord.Interaction) -> None:
+        page = await self._page()
+        await interaction.response.edit_message(embeds=page, view=self)
+
+    @discord.ui.button(label="<", style=discord.ButtonStyle.blurple)
+    async def previous(self, button: discord.ui.Button, interaction: discord.Interaction):
+        self.index = max(self.index - 1, 0)
+        await self.show(interaction)
+
+    @discord.ui.button(label="1", style=discord.ButtonStyle.gray, disabled=True)
+    async def counter(self, button: discord.ui.Button, interaction: discord.Interaction):
+        pass
+
+    @discord.ui.button(label=">", style=discord.ButtonStyle.blurple)
+    async def next(self, button: discord.ui.Button, interaction: discord.Interaction):
+        self.index += 1
+        await self.show(interaction)
+
+    async def select_source(self, interaction: discord.Interaction):
+        self.source = self.sources[int(interaction.data["values"][0])]
+        self.index = 0
+        await self.show(interaction)
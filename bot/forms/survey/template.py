@@ -1,20 +1,28 @@
+import asyncio
+import copy
+import json
 from enum import Enum
+from time import perf_counter
 from datetime import timedelta, datetime
-from asyncache import cached
-from cachetools import LRUCache
+from weakref import WeakValueDictionary
 
 import discord
 from asyncpg import Record
 from discord import InteractionType
 
+from forms.survey.responses import Submission, write_submissions, response_queue
 from questions.input_text_response import InputTextResponse
-from questions.survey_question import SurveyQuestion, from_db
+from questions.session import SurveySession
+from questions.survey_question import SurveyQuestion, fetch_questions
+from utils.cache import create_cache
 from utils.database import database as db
+from utils.title_index import TitleIndex
+from utils.invalidation import publish_template_change, PROCESS_TOKEN, TEMPLATE_CHANNEL
 from utils import embed_factory as ef
 
-
-GUILD_TEMPLATE_CACHE = LRUCache(maxsize=128)
-TEMPLATE_CACHE = LRUCache(maxsize=128)
+TEMPLATE_BY_ID = db.statement("template_by_id", """SELECT * FROM surveys.template WHERE id=$1;""")
+TEMPLATES_BY_IDS = db.statement("templates_by_ids", """SELECT * FROM surveys.template WHERE id = ANY($1::int[]);""")
+TEMPLATES_BY_GUILD = db.statement("templates_by_guild", """SELECT * FROM surveys.template WHERE guild_id=$1;""")
 
 
 class AnonymousType(Enum):
@@ -29,6 +37,23 @@ class AnonymousType(Enum):
             return False
 
 
+class DeliveryStep:
+    """
+    One Message Or Modal Sent To A User Taking A Survey
+
+    Attributes
+    ----------
+    questions: list[SurveyQuestion]
+        The questions sent in this step. Only modals of input text questions have more than one.
+    input_texts: list[dict] | None
+        The settings of the InputText for each question when the step is a modal, otherwise None.
+    """
+
+    def __init__(self, questions: list[SurveyQuestion], input_texts: list[dict] | None = None):
+        self.questions = questions
+        self.input_texts = input_texts
+
+
 class SurveyTemplate:
     def __init__(self, title: str, guild_id: int):
         self.questions: list[SurveyQuestion] = []
@@ -41,16 +66,23 @@ class SurveyTemplate:
         self.editable_responses: bool = False
         self.guild_id: int = guild_id
         self._id: int | None = None
+        self._plan: list[DeliveryStep] | None = None
+        self._size: int | None = None
+        # Questions Removed In The Wizard That Are Deleted From The Database When The Template Is Saved
+        self._deleted_questions: list[SurveyQuestion] = []
 
     @staticmethod
-    @cached(TEMPLATE_CACHE)
     async def fetch(id: int, with_questions: bool = True):
-        sql = """SELECT * FROM surveys.template WHERE id=$1;"""
-        row = await db.fetch_one(sql, id)
-        template = await SurveyTemplate.load(row)
+        template = template_cache.get(id)
+        if template is None:
+            # Cached Templates Are Read From The Primary So A Lagging Replica Cannot Put An Old Version Back In The Cache
+            row = await db.fetch_one(TEMPLATE_BY_ID, id, replica=False)
+            template = template_cache.add(await SurveyTemplate.load(row))
 
-        if with_questions:
+        if with_questions and not template.questions:
             await template.fill_questions()
+            # Adding It Again Updates Its Size In The Cache Now That It Has Questions
+            template_cache.add(template)
         return template
 
     @classmethod
@@ -64,19 +96,71 @@ class SurveyTemplate:
         template.max_entries = row["max_entries"]
         return template
 
+    def edit_copy(self) -> "SurveyTemplate":
+        """
+        A Copy Of The Template For The /edit Wizard. Users Taking The Survey Keep Using The Cached Object Until The Copy
+        Is Saved And Takes Its Place
+        :return: The copy
+        """
+        template = copy.copy(self)
+        template.questions = copy.deepcopy(self.questions)
+        template._plan = None
+        template._size = None
+        template._deleted_questions = []
+        return template
+
     async def fill_questions(self, force=False):
         if not force and len(self.questions) > 0:
             return
-        sql = """SELECT id, type FROM surveys.questions WHERE survey_id=$1;"""
-        rows = await db.fetch(sql, self._id)
-        self.questions = []
-        for row in rows:
-            self.questions.append(await from_db(row))
+        self.questions = (await fetch_questions(self._id, replica=False))[self._id]
+        self._plan = None
+        self._size = None
+
+    def estimated_size(self) -> int:
+        """A Rough Number Of Bytes The Template And Its Questions Use In Memory"""
+        if self._size is None:
+            self._size = 1024 + len(self.title) + len(self.description or "")
+            self._size += sum(x.estimated_size() for x in self.questions)
+        return self._size
+
+    @property
+    def plan(self) -> list[DeliveryStep]:
+        """The Steps To Send The Questions In. It Is Compiled Once And Reused Until The Template Is Saved"""
+        if self._plan is None:
+            self._plan = self.compile_plan()
+        return self._plan
+
+    def compile_plan(self) -> list[DeliveryStep]:
+        """
+        Orders The Questions And Groups Input Text Questions Next To Each Other Into Modals Of Up To 5
+        :return: The steps in the order they are sent
+        """
+        steps: list[DeliveryStep] = []
+        group: list[InputTextResponse] = []
+        for question in sorted(self.questions, key=lambda x: x.position):
+            if isinstance(question, InputTextResponse):
+                group.append(question)
+                # If the group is full it becomes a step
+                if len(group) == 5:
+                    steps.append(DeliveryStep(group, [x.input_text_spec() for x in group]))
+                    group = []
+                continue
+
+            # If the next question was not added to the group but there is pending questions in the group
+            if group:
+                steps.append(DeliveryStep(group, [x.input_text_spec() for x in group]))
+                group = []
+            steps.append(DeliveryStep([question]))
+        # There are no more questions but still questions pending in the group
+        if group:
+            steps.append(DeliveryStep(group, [x.input_text_spec() for x in group]))
+        return steps
 
     @staticmethod
     async def check_exists(title: str, guild_id: int) -> bool:
         sql = """SELECT title FROM surveys.template WHERE title=$1 AND guild_id=$2 LIMIT 1;"""
-        result = await db.fetch_one(sql, title, guild_id)
+        # Read From The Primary Since A Template Is Created Straight After If The Title Is Free
+        result = await db.fetch_one(sql, title, guild_id, replica=False)
         return result is not None
 
     async def save(self) -> None:
@@ -116,25 +200,43 @@ class SurveyTemplate:
                     self.max_entries,
                     self.editable_responses,
                 )
-                # Only Add It To The Cache If It Is New, As It Should Already Be In The Cache Otherwise
-                GUILD_TEMPLATE_CACHE.setdefault(self.guild_id, []).append(self)
 
+            # Deleted Along With The Other Changes So Users Taking The Survey Never See A Question That Is Gone
+            deleted = [x._id for x in self._deleted_questions if x._id is not None]
+            if deleted:
+                await conn.execute(
+                    "DELETE FROM surveys.questions WHERE survey_id=$1 AND id = ANY($2::int[]);", self._id, deleted
+                )
             for n, question in enumerate(self.questions):
                 question.template = self._id
                 question.position = n
                 await question.save(n, conn)
+            await publish_template_change(self._id, self.guild_id, conn)
+        # Adds A New Template To The Cache Or Replaces The Object That Was Copied For Editing
+        self._deleted_questions = []
+        self._plan = None
+        self._size = None
+        template_cache.replace(self)
 
     async def delete(self) -> None:
         sql = "DELETE FROM surveys.template WHERE guild_id=$1 AND id=$2;"
         await db.execute(sql, self.guild_id, self._id)
-        try:
-            GUILD_TEMPLATE_CACHE[self.guild_id].remove(self)
-        except ValueError | KeyError:
-            pass
+        template_cache.remove(self)
+        await publish_template_change(self._id, self.guild_id)
 
     async def add_question(self, question: SurveyQuestion, pos: int) -> None:
         self.questions.insert(pos, question)
 
+    def remove_question(self, pos: int) -> SurveyQuestion:
+        """
+        Removes A Question. It Is Only Deleted From The Database When The Template Is Saved
+        :param pos: The position of the question in the list of questions
+        :return: The removed question
+        """
+        question = self.questions.pop(pos)
+        self._deleted_questions.append(question)
+        return question
+
     async def summary(self, end: datetime) -> discord.Embed:
         e = discord.Embed(title=self.title, description=self.description)
         e.set_footer(text="Closes")
@@ -150,38 +252,262 @@ class SurveyTemplate:
         return e
 
     async def send_questions(
-        self, interaction: discord.Interaction, encrypted_user_id: str, response_num: int, active_id: int
-    ):
-        input_text_group: list[InputTextResponse] = []
-        for question in sorted(self.questions, key=lambda x: x.position):
-            if isinstance(question, InputTextResponse):
-                input_text_group.append(question)
-                # If the group is full send it
-                if len(input_text_group) == 5:
-                    interaction = await do_modal_transition(interaction)
-                    interaction = await question.send_question(interaction, input_text_group)
-                    input_text_group = []
-                continue
-
-            # If the next question was not added to the group but there is pending questions in the group
-            if len(input_text_group) > 0:
+        self,
+        interaction: discord.Interaction,
+        encrypted_user_id: str,
+        response_num: int,
+        active_id: int,
+        session: SurveySession | None = None,
+    ) -> bool:
+        """
+        Sends Each Question To The User And Saves The Submission Once They Are All Answered
+        :param interaction: The interaction from the user starting the survey
+        :param encrypted_user_id: The encrypted ID of the user
+        :param response_num: How many times the user has taken the survey including this time
+        :param active_id: The ID of the active survey
+        :param session: The session to store the answers in. Its `submitted` flag is set once the submission is saved
+        :return: If the survey was completed. False if the user stopped responding before the end
+        """
+        # The Answers Are Kept In The Session So The Cached Template Is Never Changed While It Is Being Taken
+        session = session or SurveySession()
+        plan = self.plan
+        for step in plan:
+            if step.input_texts is not None:
                 interaction = await do_modal_transition(interaction)
-                interaction = await input_text_group[-1].send_question(interaction, input_text_group)
-                input_text_group = []
+                if interaction is None:
+                    return False
+                interaction = await step.questions[-1].send_question(
+                    interaction, session, step.questions, step.input_texts
+                )
+            else:
+                interaction = await step.questions[0].send_question(interaction, session)
+            if interaction is None:
+                return False
+
+        # Only The Questions That Were Asked Are Saved. The Response ID Is Filled In When The Submission Is Written
+        asked = [q for step in plan for q in step.questions if q._id is not None]
+        rows = [x for x in [await q.response_row(None, session) for q in asked] if x is not None]
+        submission = Submission(encrypted_user_id, response_num, active_id, self._id, rows)
+        if response_queue.enabled:
+            await response_queue.put(submission)
+        else:
+            async with db.transaction() as conn:
+                await write_submissions(conn, [submission])
+        session.submitted = True
+        await interaction.respond(embed=await ef.success("You Have Completed The Survey!"), ephemeral=True)
+        return True
+
+
+class TemplateCache:
+    """
+    An Identity Map Of Templates So Every Part Of The Bot Shares One Object Per Template ID
+
+    Every template that is still referenced anywhere, such as by an active survey, can be found by its ID. Recently
+    used templates and the title indexes of recently used guilds are also kept alive by caches that are bounded by the
+    estimated memory of the templates rather than by their count. The `/edit` wizard changes a copy which replaces the
+    cached object when it is saved, so the change is seen by `/send` and the survey buttons straight away while users
+    already taking the survey finish the version they started.
+
+    When a TTL is set, templates that have expired are loaded again even if the old object is still referenced.
+
+    Attributes
+    ----------
+    hits: int
+        Lookups answered from the cache.
+    misses: int
+        Lookups that had to go to the database.
+    """
+
+    def __init__(self):
+        self._templates: WeakValueDictionary[int, SurveyTemplate] = WeakValueDictionary()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.configure()
+
+    def configure(
+        self,
+        max_bytes: int = 16_000_000,
+        ttl: float | None = None,
+        guild_max_bytes: int = 16_000_000,
+        guild_ttl: float | None = None,
+    ) -> None:
+        """
+        Sets The Cache Options From The Config. Anything Already Cached Is Dropped
+        :param max_bytes: The estimated memory recently used templates may take up
+        :param ttl: Seconds a template is kept before it is loaded again. None keeps it until it is evicted
+        :param guild_max_bytes: The estimated memory the title indexes of recently used guilds may take up
+        :param guild_ttl: Seconds the templates of a guild are kept before they are listed again
+        """
+        self.ttl = ttl
+        self._recent = create_cache(max_bytes, ttl, SurveyTemplate.estimated_size)
+        self._guilds = create_cache(
+            guild_max_bytes, guild_ttl, lambda index: 256 + sum(x.estimated_size() for x in index.items)
+        )
+        self._templates.clear()
+
+    @property
+    def evictions(self) -> int:
+        return self._recent.evictions + self._guilds.evictions
+
+    @property
+    def expirations(self) -> int:
+        return getattr(self._recent, "expirations", 0) + getattr(self._guilds, "expirations", 0)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @property
+    def size(self) -> int:
+        return self._recent.currsize
+
+    @property
+    def max_size(self) -> int:
+        return self._recent.maxsize
+
+    @property
+    def guild_size(self) -> int:
+        return self._guilds.currsize
+
+    @property
+    def guild_max_size(self) -> int:
+        return self._guilds.maxsize
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def __contains__(self, id: int) -> bool:
+        # Checks Without Counting A Hit Or Miss
+        return id in self._recent
+
+    def _keep(self, template: SurveyTemplate) -> SurveyTemplate:
+        # Without A TTL An Object That Is Still Referenced Is Reused. With One The Newly Loaded Object Replaces It
+        if self.ttl is None:
+            return self._templates.setdefault(template._id, template)
+        old = self._templates.get(template._id)
+        self._templates[template._id] = template
+        # The Replaced Object Would Otherwise Stay Listed Next To The New One
+        if old is not None and old is not template:
+            index = self._guilds.get(old.guild_id)
+            if index is not None:
+                index.remove(old)
+        return template
 
-            interaction = await question.send_question(interaction)
-        # There are no more questions but still questions pending in the group
-        if len(input_text_group) > 0:
-            interaction = await do_modal_transition(interaction)
-            interaction = await input_text_group[-1].send_question(interaction, input_text_group)
+    def _cache_recent(self, template: SurveyTemplate) -> None:
+        try:
+            self._recent[template._id] = template
+        except ValueError:
+            # The Template Alone Is Larger Than The Whole Cache
+            pass
 
-        async with db.transaction() as conn:
-            sql = """INSERT INTO surveys.responses (user_id, response_num, active_survey_id, template_id) 
-                    VALUES ($1, $2, $3, $4) RETURNING id;"""
-            response_id = await conn.fetchval(sql, encrypted_user_id, response_num, active_id, self._id)
-            for question in self.questions:
-                await question.save_response(conn, encrypted_user_id, active_id, response_id)
-        await interaction.respond(embed=await ef.success("You Have Completed The Survey!"), ephemeral=True)
+    def get(self, id: int) -> SurveyTemplate | None:
+        template = self._recent.get(id)
+        if template is None and self.ttl is None:
+            template = self._templates.get(id)
+        if template is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Setting It Again Marks It As Recently Used And Updates Its Size
+        self._cache_recent(template)
+        return template
+
+    def add(self, template: SurveyTemplate) -> SurveyTemplate:
+        """
+        Adds A Template Unless An Object For The Same ID Is Already Cached
+        :param template: The template to add
+        :return: The cached object for the template, which should be used instead of the one given
+        """
+        template = self._keep(template)
+        self._cache_recent(template)
+        index = self._guilds.get(template.guild_id)
+        if index is not None:
+            index.set(template.title, template)
+        return template
+
+    def replace(self, template: SurveyTemplate) -> None:
+        """
+        Caches A Saved Template In Place Of Any Other Object For The Same ID, Such As The One It Was Copied From
+        :param template: The saved template
+        """
+        old = self._templates.get(template._id)
+        self._templates[template._id] = template
+        self._cache_recent(template)
+        index = self._guilds.get(template.guild_id)
+        if index is not None:
+            if old is not None:
+                index.remove(old)
+            index.set(template.title, template)
+
+    def remove(self, template: SurveyTemplate) -> None:
+        cached = self._templates.pop(template._id, None)
+        self._recent.pop(template._id, None)
+        index = self._guilds.get(template.guild_id)
+        if index is not None:
+            index.remove(template)
+            if cached is not None:
+                index.remove(cached)
+
+    def get_guild(self, guild_id: int) -> TitleIndex | None:
+        index = self._guilds.get(guild_id)
+        if index is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return index
+
+    def set_guild(self, guild_id: int, templates: list[SurveyTemplate]) -> TitleIndex:
+        """
+        Caches The Templates Of A Guild. Templates That Are Already Cached Keep Their Existing Object
+        :param guild_id: The ID of the guild
+        :param templates: Every template in the guild
+        :return: The title index of the guild
+        """
+        templates = [self._keep(x) for x in templates]
+        index = TitleIndex([(x.title, x) for x in templates])
+        try:
+            self._guilds[guild_id] = index
+        except ValueError:
+            pass
+        return index
+
+    def evict(self, id: int, guild_id: int | None = None) -> None:
+        """
+        Drops A Template That Was Changed By Another Process So It Is Loaded Again When Next Used. The Listing Of Its
+        Guild Is Dropped As Well Since The Title May Have Changed
+        :param id: The ID of the template
+        :param guild_id: The ID of the guild, if it is known
+        """
+        template = self._templates.pop(id, None)
+        self._recent.pop(id, None)
+        if guild_id is None and template is not None:
+            guild_id = template.guild_id
+        if guild_id is not None:
+            self._guilds.pop(guild_id, None)
+
+    def clear(self) -> None:
+        self._templates.clear()
+        self._recent.clear()
+        self._guilds.clear()
+
+
+template_cache = TemplateCache()
+
+
+def on_template_change(payload: str | None) -> None:
+    if payload is None:
+        # Changes Made While The Listener Was Reconnecting Are Unknown So Everything Is Loaded Again
+        template_cache.clear()
+        return
+    data = json.loads(payload)
+    if data["origin"] != PROCESS_TOKEN:
+        template_cache.evict(data["template"], data["guild"])
+
+
+async def listen_for_template_changes() -> None:
+    """Evicts Templates From The Cache When Another Bot Process Changes Them"""
+    await db.listen(TEMPLATE_CHANNEL, on_template_change)
 
 
 class ModalTransition(discord.ui.View):
@@ -211,21 +537,61 @@ async def do_modal_transition(interaction: discord.Interaction) -> discord.Inter
 
 
 async def title_autocomplete(ctx: discord.AutocompleteContext):
-    match = []
-    templates = await get_templates(ctx.interaction.guild_id)
-    for template in templates:
-        if template.title.startswith(ctx.value):
-            match.append(discord.OptionChoice(name=template.title, value=str(template._id)))
-            if len(match) == 24:
-                break
-    return match
+    index = await get_title_index(ctx.interaction.guild_id)
+    return [discord.OptionChoice(name=x.title, value=str(x._id)) for x in index.search(ctx.value, 24)]
+
+
+async def fill_templates(templates: list[SurveyTemplate], force=False) -> None:
+    """Fills The Questions Of Many Templates At Once Using A Single Query"""
+    pending = {x._id: x for x in templates if force or len(x.questions) == 0}
+    if not pending:
+        return
+    for template_id, questions in (await fetch_questions(*pending, replica=False)).items():
+        pending[template_id].questions = questions
+        pending[template_id]._plan = None
+        pending[template_id]._size = None
+
+
+async def warm_templates(template_ids: list[int], chunk_size: int = 200, concurrency: int = 2) -> None:
+    """
+    Loads Templates And Their Questions Into The Cache In Chunks Using One Query Per Chunk For Each
+    :param template_ids: The IDs of the templates to load
+    :param chunk_size: The most templates loaded by one query
+    :param concurrency: The most chunks loaded at once, so the warm up does not use every pooled connection
+    """
+    template_ids = [x for x in dict.fromkeys(template_ids) if x not in template_cache]
+    if not template_ids:
+        return
+    start = perf_counter()
+    chunks = [template_ids[i : i + chunk_size] for i in range(0, len(template_ids), chunk_size)]
+    semaphore = asyncio.Semaphore(concurrency)
+    loaded = 0
+
+    async def warm_chunk(ids: list[int]) -> None:
+        nonlocal loaded
+        async with semaphore:
+            rows = await db.fetch(TEMPLATES_BY_IDS, ids, replica=False)
+            templates = [template_cache.add(await SurveyTemplate.load(x)) for x in rows]
+            await fill_templates(templates)
+            for template in templates:
+                # Adding It Again Updates Its Size In The Cache Now That It Has Questions
+                template_cache.add(template)
+            loaded += len(templates)
+            print(f"Warmed {loaded}/{len(template_ids)} Templates")
+
+    results = await asyncio.gather(*[warm_chunk(x) for x in chunks], return_exceptions=True)
+    failed = sum(isinstance(x, Exception) for x in results)
+    print(f"Template Warm Up Loaded {loaded} Templates In {perf_counter() - start:.2f}s ({failed} Chunks Failed)")
+
+
+async def get_title_index(guild_id: int) -> TitleIndex:
+    index = template_cache.get_guild(guild_id)
+    if index is None:
+        rows = await db.fetch(TEMPLATES_BY_GUILD, guild_id, replica=False)
+        index = template_cache.set_guild(guild_id, [await SurveyTemplate.load(x) for x in rows])
+    return index
 
 
 async def get_templates(guild_id: int) -> list[SurveyTemplate]:
-    try:
-        return GUILD_TEMPLATE_CACHE[guild_id]
-    except KeyError:
-        sql = """SELECT * FROM surveys.template WHERE guild_id=$1;"""
-        rows = await db.fetch(sql, guild_id)
-        GUILD_TEMPLATE_CACHE[guild_id] = [await SurveyTemplate.load(x) for x in rows]
-        return GUILD_TEMPLATE_CACHE[guild_id]
+    """Gets Every Template In A Guild Sorted By Title"""
+    return (await get_title_index(guild_id)).items
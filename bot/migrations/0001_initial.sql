@@ -0,0 +1,57 @@
+-- The Tables As They Existed Before Migrations Were Tracked. Everything Is Conditional So This Is Safe To Run
+-- Against A Database That Was Created By Hand
+CREATE SCHEMA IF NOT EXISTS surveys;
+
+CREATE TABLE IF NOT EXISTS surveys.template (
+    id serial PRIMARY KEY,
+    guild_id bigint NOT NULL,
+    title text NOT NULL,
+    description text NOT NULL DEFAULT '',
+    anonymous smallint NOT NULL DEFAULT 0,
+    entries_per integer NOT NULL DEFAULT 1,
+    time_limit interval,
+    max_entries integer,
+    editable boolean NOT NULL DEFAULT false
+);
+
+CREATE TABLE IF NOT EXISTS surveys.questions (
+    id serial PRIMARY KEY,
+    survey_id integer NOT NULL REFERENCES surveys.template (id) ON DELETE CASCADE,
+    text text NOT NULL,
+    position integer NOT NULL,
+    required boolean NOT NULL DEFAULT true,
+    description text NOT NULL DEFAULT '',
+    type smallint NOT NULL,
+    question_data jsonb NOT NULL DEFAULT '{}'
+);
+
+CREATE TABLE IF NOT EXISTS surveys.active_guild_surveys (
+    id serial PRIMARY KEY,
+    end_date timestamp NOT NULL,
+    template_id integer NOT NULL REFERENCES surveys.template (id) ON DELETE CASCADE,
+    channel_id bigint,
+    message_id bigint
+);
+
+CREATE TABLE IF NOT EXISTS surveys.responses (
+    id serial PRIMARY KEY,
+    user_id text NOT NULL,
+    response_num integer NOT NULL,
+    active_survey_id integer NOT NULL REFERENCES surveys.active_guild_surveys (id) ON DELETE CASCADE,
+    template_id integer NOT NULL REFERENCES surveys.template (id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS surveys.question_response (
+    response integer NOT NULL REFERENCES surveys.responses (id) ON DELETE CASCADE,
+    question integer NOT NULL REFERENCES surveys.questions (id) ON DELETE CASCADE,
+    response_data jsonb NOT NULL,
+    PRIMARY KEY (response, question)
+);
+
+CREATE TABLE IF NOT EXISTS surveys.data_sharing_consent (
+    user_id text NOT NULL,
+    guild_id text NOT NULL,
+    timestamp timestamp NOT NULL,
+    version_id integer NOT NULL,
+    PRIMARY KEY (user_id, guild_id)
+);
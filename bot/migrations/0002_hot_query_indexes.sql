@@ -0,0 +1,23 @@
+-- no-transaction
+-- The Indexes Are Built Concurrently So Writes Are Not Blocked On Large Tables. If A Build Fails It Leaves An Invalid
+-- Index Behind, Which Is Dropped When The Migration Is Run Again
+-- Indexes For The Queries Run On Every Button Click, Autocomplete And Results Page
+
+-- The Times Taken Check In SurveyButton.callback
+CREATE INDEX CONCURRENTLY IF NOT EXISTS responses_active_survey_user_idx
+    ON surveys.responses (active_survey_id, user_id) INCLUDE (response_num);
+-- Listing Responses By Template In /results. The Pages Are Loaded In Order Of The Response ID, So It Is Included To
+-- Let Each Page Start Where The Last One Ended Without Sorting
+CREATE INDEX CONCURRENTLY IF NOT EXISTS responses_template_id_idx ON surveys.responses (template_id, id);
+-- Listing Responses By Question In /results In The Same Order. The Primary Key Only Covers Lookups By Response
+CREATE INDEX CONCURRENTLY IF NOT EXISTS question_response_question_response_idx
+    ON surveys.question_response (question, response);
+-- Loading The Questions Of A Template In Order
+CREATE INDEX CONCURRENTLY IF NOT EXISTS questions_survey_position_idx ON surveys.questions (survey_id, position);
+-- Listing The Templates Of A Guild
+CREATE INDEX CONCURRENTLY IF NOT EXISTS template_guild_idx ON surveys.template (guild_id);
+
+-- Surveys Are Marked As Ended Instead Of Being Deleted, So Only Running Surveys Are Kept In The End Date Index
+ALTER TABLE surveys.active_guild_surveys ADD COLUMN IF NOT EXISTS ended boolean NOT NULL DEFAULT false;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS active_guild_surveys_running_end_date_idx
+    ON surveys.active_guild_surveys (end_date) WHERE NOT ended;
@@ -0,0 +1,7 @@
+-- A Counter Of The Entries Each Active Survey Has Taken So The Maximum Entries Check Does Not Count The Responses.
+-- An Entry Is Reserved When A User Starts Taking The Survey And Released If They Do Not Finish. It Is Only Kept Up To
+-- Date For Surveys Whose Template Has A Maximum Number Of Entries
+ALTER TABLE surveys.active_guild_surveys ADD COLUMN IF NOT EXISTS entries integer NOT NULL DEFAULT 0;
+UPDATE surveys.active_guild_surveys a
+    SET entries = (SELECT COUNT(*) FROM surveys.responses r WHERE r.active_survey_id = a.id)
+    WHERE NOT ended;
@@ -0,0 +1,85 @@
+-- Running Totals Of The Answers To Each Question So /results Summaries Read A Row Per Question Or Option Instead Of
+-- Scanning Every Response. They Are Updated In The Same Transaction That Writes The Responses. The Responses Written
+-- Before This Migration Are Counted At The End With The Same Upserts As `forms/survey/aggregates.py`
+
+CREATE TABLE IF NOT EXISTS surveys.template_aggregates (
+    template_id integer PRIMARY KEY REFERENCES surveys.template (id) ON DELETE CASCADE,
+    responses bigint NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS surveys.question_aggregates (
+    question integer PRIMARY KEY REFERENCES surveys.questions (id) ON DELETE CASCADE,
+    answered bigint NOT NULL DEFAULT 0,
+    -- The Earliest And Latest Answer To A Date Question In Its Stored Format And As A Number To Compare Them By
+    min_value text,
+    min_key double precision,
+    max_value text,
+    max_key double precision,
+    -- The Lengths Of The Answers To A Text Question
+    total_length bigint NOT NULL DEFAULT 0,
+    min_length integer,
+    max_length integer
+);
+
+CREATE TABLE IF NOT EXISTS surveys.option_aggregates (
+    question integer NOT NULL REFERENCES surveys.questions (id) ON DELETE CASCADE,
+    option integer NOT NULL,
+    count bigint NOT NULL DEFAULT 0,
+    PRIMARY KEY (question, option)
+);
+
+-- Backfill Every Existing Response
+INSERT INTO surveys.template_aggregates AS a (template_id, responses)
+SELECT template_id, COUNT(*) FROM surveys.responses WHERE TRUE
+GROUP BY template_id ORDER BY template_id
+ON CONFLICT (template_id) DO UPDATE SET responses = a.responses + EXCLUDED.responses;
+
+INSERT INTO surveys.question_aggregates AS a
+    (question, answered, min_value, min_key, max_value, max_key, total_length, min_length, max_length)
+SELECT question,
+    COUNT(*) FILTER (WHERE value IS DISTINCT FROM ''),
+    (array_agg(value ORDER BY key) FILTER (WHERE key IS NOT NULL))[1], MIN(key),
+    (array_agg(value ORDER BY key DESC) FILTER (WHERE key IS NOT NULL))[1], MAX(key),
+    COALESCE(SUM(length), 0),
+    MIN(length) FILTER (WHERE length > 0),
+    MAX(length) FILTER (WHERE length > 0)
+FROM (
+    SELECT qr.question, v.value,
+        CASE WHEN q.type = 2 THEN
+            CASE (q.question_data->>'type')::int
+                WHEN 1 THEN CASE WHEN v.value ~ '^[0-9]{4}-[0-9]{2}-[0-9]{2}$'
+                    THEN extract(epoch FROM v.value::date)::float8 END
+                WHEN 2 THEN CASE
+                    WHEN v.value ~ '^[0-9]{2}:[0-9]{2}(:[0-9]{2}([.][0-9]+)?)?([+-][0-9]{2}:[0-9]{2})?$'
+                    THEN extract(epoch FROM v.value::timetz)::float8 END
+                ELSE CASE WHEN v.value ~ '^-?[0-9]+([.][0-9]+)?(e[-+]?[0-9]+)?$'
+                    THEN v.value::float8 END
+            END
+        END AS key,
+        CASE WHEN q.type = 0 THEN char_length(v.value) END AS length
+    FROM surveys.question_response AS qr JOIN surveys.questions AS q ON q.id = qr.question
+        CROSS JOIN LATERAL (
+            SELECT COALESCE(qr.response_data->>'text', qr.response_data->>'timestamp') AS value
+        ) AS v
+    WHERE TRUE
+) AS answers
+GROUP BY question ORDER BY question
+ON CONFLICT (question) DO UPDATE SET
+    answered = a.answered + EXCLUDED.answered,
+    min_value = CASE WHEN a.min_key IS NULL OR EXCLUDED.min_key < a.min_key
+        THEN EXCLUDED.min_value ELSE a.min_value END,
+    min_key = LEAST(a.min_key, EXCLUDED.min_key),
+    max_value = CASE WHEN a.max_key IS NULL OR EXCLUDED.max_key > a.max_key
+        THEN EXCLUDED.max_value ELSE a.max_value END,
+    max_key = GREATEST(a.max_key, EXCLUDED.max_key),
+    total_length = a.total_length + EXCLUDED.total_length,
+    min_length = LEAST(a.min_length, EXCLUDED.min_length),
+    max_length = GREATEST(a.max_length, EXCLUDED.max_length);
+
+INSERT INTO surveys.option_aggregates AS a (question, option, count)
+SELECT qr.question, selected.option::int, COUNT(*)
+FROM surveys.question_response AS qr JOIN surveys.questions AS q ON q.id = qr.question
+    CROSS JOIN LATERAL jsonb_array_elements_text(qr.response_data->'selected') AS selected(option)
+WHERE TRUE
+GROUP BY 1, 2 ORDER BY 1, 2
+ON CONFLICT (question, option) DO UPDATE SET count = a.count + EXCLUDED.count;
@@ -9,9 +9,11 @@ from discord import Interaction
 from dateutil.parser import parse as datetime_parser, ParserError, UnknownTimezoneWarning
 
 from questions.input_text_response import InputTextResponse, GetResponse
+from questions.session import SurveySession
 from questions.survey_question import QuestionType, GetBaseInfo
 from utils.embed_factory import general
 from utils.database import database as db
+from utils.invalidation import publish_template_change
 from utils.timers import Timer
 
 
@@ -44,7 +46,6 @@ class DateQuestion(InputTextResponse):
         self.required = True
         self._id = None
 
-        self.value: datetime.datetime | datetime.time | datetime.timedelta | datetime.date | None = None
         self.type: DateQuestionType = DateQuestionType.DATETIME
         self.minimum: datetime.datetime | datetime.time | datetime.timedelta | datetime.date | None = None
         self.maximum: datetime.datetime | datetime.time | datetime.timedelta | datetime.date | None = None
@@ -59,8 +60,14 @@ class DateQuestion(InputTextResponse):
         if not await v.wait():
             return v.interaction
 
-    async def send_question(self, interaction: discord.Interaction, group: list[Self] = None) -> discord.Interaction:
-        modal = GetResponse(group or [self])
+    async def send_question(
+        self,
+        interaction: discord.Interaction,
+        session: SurveySession,
+        group: list[Self] = None,
+        specs: list[dict] = None,
+    ) -> discord.Interaction:
+        modal = GetResponse(group or [self], session, specs)
         await interaction.response.send_modal(modal)
         await modal.wait()
         return modal.interaction
@@ -146,16 +153,16 @@ class DateQuestion(InputTextResponse):
             "maximum": await self._get_storable_format(self.maximum),
         }
 
-    async def _create_response_data(self) -> dict:
-        timestamp = await self._get_storable_format(self.value)
+    async def _create_response_data(self, session: SurveySession) -> dict:
+        timestamp = await self._get_storable_format(session.get(self))
         return {
             "timestamp": timestamp,
         }
 
     async def save(self, position: int, conn: Connection = None) -> None:
-        # Setting conn to be either a Connection or my Database object is probably bad practice
         if conn is None:
-            conn = db
+            async with db.transaction() as conn:
+                return await self.save(position, conn)
         if self._id:
             base_sql = """
                     UPDATE surveys.questions 
@@ -201,25 +208,61 @@ class DateQuestion(InputTextResponse):
     async def delete(self) -> None:
         sql = """DELETE FROM surveys.questions WHERE id=$1;"""
         await db.execute(sql, self._id)
-
-    async def save_response(self, conn: Connection, encrypted_user_id: str, active_id: int, response_id: int) -> None:
-        sql = """INSERT INTO surveys.question_response (response, question, response_data) VALUES ($1, $2, $3);"""
-        await conn.execute(sql, response_id, self._id, await self._create_response_data())
+        await publish_template_change(self.template)
 
     async def view_response(self, response: dict) -> str:
-        return await self._get_discord_format(await self._from_storable_format(response["timestamp"]))
+        return (await self.view_responses([response]))[0]
+
+    async def view_responses(self, responses: list[dict]) -> list[str]:
+        # Picks The Conversion Once For The Batch And Goes Straight From The Stored Format To The Discord Format. This
+        # Matches `_get_discord_format(_from_storable_format(x))`
+        if self.type == DateQuestionType.DATETIME:
+
+            def convert(timestamp: str) -> str:
+                return f"<t:{int(float(timestamp))}:F>"
+
+        elif self.type == DateQuestionType.DATE:
+
+            def convert(timestamp: str) -> str:
+                midnight = datetime.datetime.combine(datetime.date.fromisoformat(timestamp), datetime.time())
+                return f"<t:{int(midnight.timestamp())}:D>"
+
+        elif self.type == DateQuestionType.TIME:
+            today = datetime.datetime.now(datetime.UTC).date()
+
+            def convert(timestamp: str) -> str:
+                moment = datetime.datetime.combine(today, datetime.time.fromisoformat(timestamp))
+                return f"<t:{int(moment.timestamp())}:T>"
+
+        elif self.type == DateQuestionType.DURATION:
+
+            def convert(timestamp: str) -> str:
+                return str(datetime.timedelta(seconds=float(timestamp)))
+
+        else:
+            raise TypeError("value must be of type DateQuestionType")
 
-    def get_input_text(self) -> discord.ui.InputText:
-        return discord.ui.InputText(
+        # Many Responses Share The Same Answer So Each Distinct One Is Only Converted Once
+        converted = {"": "None"}
+        result = []
+        for response in responses:
+            timestamp = response["timestamp"]
+            if timestamp not in converted:
+                converted[timestamp] = convert(timestamp)
+            result.append(converted[timestamp])
+        return result
+
+    def input_text_spec(self) -> dict:
+        return dict(
             label=self.title[: min(len(self.title), 45)],
             required=self.required,
             style=discord.InputTextStyle.long,
             placeholder=self.prompt_user_format(),
         )
 
-    async def handle_input_text_response(self, text: str) -> str | None:
+    async def handle_input_text_response(self, text: str, session: SurveySession) -> str | None:
         if text is None or (not self.required and text == ""):
-            self.value = None
+            session.set(self, None)
             return None
         converted = None
         try:
@@ -262,8 +305,8 @@ class DateQuestion(InputTextResponse):
             limit_value = await self._get_discord_format(self.minimum or self.maximum)
             return f"The Value `{text}` Must Be {limit_type} Than {limit_value}"
 
-        # If it got past all the checks assign it to the value
-        self.value = converted
+        # If it got past all the checks store it as the answer
+        session.set(self, converted)
 
 
 class Settings(discord.ui.View):
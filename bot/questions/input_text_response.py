@@ -5,31 +5,47 @@ import discord.ui
 from discord import Interaction
 from utils import embed_factory as ef
 
+from questions.session import SurveySession
 from questions.survey_question import SurveyQuestion
 
 
 class InputTextResponse(SurveyQuestion, ABC):
     @abstractmethod
-    def get_input_text(self) -> discord.ui.InputText:
+    def input_text_spec(self) -> dict:
+        """
+        The Settings Of An InputText That Fits The Questions Requirements. Templates Keep These In Their Delivery Plan
+        :return: The keyword arguments for the InputText
+        """
+        raise NotImplementedError
+
+    def get_input_text(self, spec: dict = None) -> discord.ui.InputText:
         """
         Creates an InputText that fits the questions requirements
+        :param spec: Prebuilt settings from `input_text_spec`
         :return: The InputText
         """
-        raise NotImplementedError
+        return discord.ui.InputText(**(spec or self.input_text_spec()))
 
     @abstractmethod
-    async def handle_input_text_response(self, text: str) -> str | None:
+    async def handle_input_text_response(self, text: str, session: SurveySession) -> str | None:
         """
         Checks if the given input meets the questions criteria.
-        If the input meets the criteria it is set as the value of the question.
+        If the input meets the criteria it is set as the answer in the session.
         Otherwise, an error is returned
         :param text: The text from the InputText in the submitted modal
+        :param session: The session of the user the answer is stored in
         :return: An error in the form of a string or None if there are no errors
         """
         raise NotImplementedError
 
-    async def send_question(self, interaction: discord.Interaction, group: list[Self] = None) -> discord.Interaction:
-        modal = GetResponse(group or [self])
+    async def send_question(
+        self,
+        interaction: discord.Interaction,
+        session: SurveySession,
+        group: list[Self] = None,
+        specs: list[dict] = None,
+    ) -> discord.Interaction:
+        modal = GetResponse(group or [self], session, specs)
         await interaction.response.send_modal(modal)
         await modal.wait()
         return modal.interaction
@@ -38,21 +54,25 @@ class InputTextResponse(SurveyQuestion, ABC):
 class RetryButton(discord.ui.Button):
     interaction: discord.Interaction
 
-    def __init__(self, retry: list[InputTextResponse]):
+    def __init__(self, retry: list[InputTextResponse], session: SurveySession):
         super().__init__(label="Click To Fix The Errors")
         self.retry = retry
+        self.session = session
+        self.interaction = None
 
     async def callback(self, interaction: Interaction):
-        self.interaction = await self.retry[0].send_question(interaction, self.retry)
+        self.interaction = await self.retry[0].send_question(interaction, self.session, self.retry)
         self.view.stop()
 
 
 class GetResponse(discord.ui.Modal):
-    def __init__(self, questions: list[InputTextResponse]):
-        super().__init__(title="Type Your Answer Below")
-        for question in questions:
-            self.add_item(question.get_input_text())
+    def __init__(self, questions: list[InputTextResponse], session: SurveySession, specs: list[dict] = None):
+        # A Timeout Lets A Survey That Was Abandoned In The Modal End Instead Of Holding Its Entry Forever
+        super().__init__(title="Type Your Answer Below", timeout=900)
+        for n, question in enumerate(questions):
+            self.add_item(question.get_input_text(specs[n] if specs else None))
         self.questions = questions
+        self.session = session
         self.interaction = None
 
     async def callback(self, interaction: discord.Interaction):
@@ -60,12 +80,12 @@ class GetResponse(discord.ui.Modal):
         errors: list[str] = []
         retry: list[InputTextResponse] = []
         for n, question in enumerate(self.questions):
-            e = await question.handle_input_text_response(self.children[n].value)
+            e = await question.handle_input_text_response(self.children[n].value, self.session)
             if e is not None:
                 retry.append(question)
                 errors.append(e)
         if retry:
-            b = RetryButton(retry)
+            b = RetryButton(retry, self.session)
             v = discord.ui.View(b)
             e = await ef.input_error("Some Questions Had Invalid Inputs", errors)
             await interaction.response.send_message(embed=e, view=v, ephemeral=True)
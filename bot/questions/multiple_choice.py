@@ -2,8 +2,10 @@ import discord
 from asyncpg import Connection, Record
 from discord import Interaction
 
+from questions.session import SurveySession
 from questions.survey_question import SurveyQuestion, QuestionType, GetBaseInfo
 from utils.database import database as db
+from utils.invalidation import publish_template_change
 from utils.embed_factory import general
 
 
@@ -44,10 +46,8 @@ class MultipleChoice(SurveyQuestion):
         self.min_selects: int = 1
         self.max_selects: int = 1
 
-        self.selected: set[MultipleChoiceOption] = set()
-
-    async def send_question(self, interaction: discord.Interaction) -> discord.Interaction:
-        v = ResponseView(self)
+    async def send_question(self, interaction: discord.Interaction, session: SurveySession) -> discord.Interaction:
+        v = ResponseView(self, session)
         await interaction.respond(view=v, embed=await v.create_embed(), ephemeral=True)
         await v.wait()
         return v.interaction
@@ -73,24 +73,33 @@ class MultipleChoice(SurveyQuestion):
     async def short_display(self) -> str:
         return f"{self.title} {self.description}"
 
+    def estimated_size(self) -> int:
+        return super().estimated_size() + sum(128 + len(x.text) for x in self.options)
+
     async def view_response(self, response: dict) -> str:
+        return (await self.view_responses([response]))[0]
+
+    async def view_responses(self, responses: list[dict]) -> list[str]:
+        # The Lookup Is Built Once For The Whole Batch
         options = {x.id: x.text for x in self.options}
-        result = ", ".join([options[x] for x in response["selected"]])
-        return result
+        return [", ".join([options[x] for x in response["selected"]]) for response in responses]
 
-    async def save_response(self, conn: Connection, encrypted_user_id: str, active_id: int, response_id: int) -> None:
-        if not self.selected:
-            return
-        sql = """INSERT INTO surveys.question_response (response, question, response_data) VALUES ($1, $2, $3);"""
-        await conn.execute(sql, response_id, self._id, await self._create_response_data())
+    async def response_row(
+        self, response_id: int | None, session: SurveySession
+    ) -> tuple[int | None, int, dict] | None:
+        if not session.get(self):
+            return None
+        return await super().response_row(response_id, session)
 
     async def delete(self) -> None:
         sql = """DELETE FROM surveys.questions WHERE id=$1;"""
         await db.execute(sql, self._id)
+        await publish_template_change(self.template)
 
     async def save(self, position: int, conn: Connection = None) -> None:
         if conn is None:
-            conn = db
+            async with db.transaction() as conn:
+                return await self.save(position, conn)
         if self._id:
             base_sql = """
                 UPDATE surveys.questions 
@@ -125,8 +134,8 @@ class MultipleChoice(SurveyQuestion):
             )
             self._id = record[0]["id"]
 
-    async def _create_response_data(self) -> dict:
-        return {"selected": [x.id for x in self.selected]}
+    async def _create_response_data(self, session: SurveySession) -> dict:
+        return {"selected": [x.id for x in session.get(self, set())]}
 
     async def _create_data(self) -> dict:
         return {
@@ -372,23 +381,26 @@ class ResponseView(discord.ui.View):
             await self.view.update(interaction)
 
     class ChoiceSelect(discord.ui.Select):
-        def __init__(self, question: MultipleChoice):
+        def __init__(self, question: MultipleChoice, session: SurveySession):
             super().__init__(
                 placeholder="Select Options", min_values=question.min_selects, max_values=question.max_selects
             )
             self.option_map = {x.id: x for x in question.options}
+            selected = session.get(question, set())
             for option in question.options:
-                self.add_option(label=option.text, value=str(option.id), default=option in question.selected)
+                self.add_option(label=option.text, value=str(option.id), default=option in selected)
 
         async def callback(self, interaction: Interaction):
-            self.view.question.selected = {self.option_map[int(x)] for x in self.values}
+            self.view.session.set(self.view.question, {self.option_map[int(x)] for x in self.values})
             self.view.interaction = interaction
             self.view.stop()
 
-    def __init__(self, question: MultipleChoice):
+    def __init__(self, question: MultipleChoice, session: SurveySession):
         super().__init__()
         self.question = question
-        self.add_item(ResponseView.ChoiceSelect(question))
+        self.session = session
+        self.interaction = None
+        self.add_item(ResponseView.ChoiceSelect(question, session))
         if question.required:
             self.remove_item(self.skip)
 
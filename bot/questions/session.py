@@ -0,0 +1,39 @@
+from typing import Any, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from questions.survey_question import SurveyQuestion
+
+
+class SurveySession:
+    """
+    The Answers Of One User Taking A Survey
+
+    Questions read and write their answers through the session instead of storing them on themselves, so one cached
+    template can be taken by any number of users at the same time.
+
+    Attributes
+    ----------
+    answers: dict[int, Any]
+        The answer to each question keyed by the ID of the question. Questions that were not answered are missing.
+    submitted: bool
+        If the answers have been saved or queued to be saved.
+    """
+
+    def __init__(self):
+        self.answers: dict[int, Any] = {}
+        self.submitted: bool = False
+
+    def get(self, question: "SurveyQuestion", default: Any = None) -> Any:
+        """
+        Gets The Answer To A Question
+        :param question: The question that was answered
+        :param default: The value returned if the question has not been answered
+        :return: The answer in the form the question stored it
+        """
+        return self.answers.get(question._id, default)
+
+    def set(self, question: "SurveyQuestion", answer: Any) -> None:
+        self.answers[question._id] = answer
+
+    def __contains__(self, question: "SurveyQuestion") -> bool:
+        return question._id in self.answers
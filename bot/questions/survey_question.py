@@ -4,10 +4,18 @@ from asyncpg import Record, Connection
 from abc import ABC, abstractmethod
 from enum import Enum
 
+from questions.session import SurveySession
 from utils import embed_factory as ef
 from utils.database import database as db
 
-# Use Of Lazy Imports In The `from_db` Function
+TEMPLATE_QUESTIONS = db.statement(
+    "template_questions",
+    """
+            SELECT text, id, position, survey_id, required, description, type, question_data 
+            FROM surveys.questions
+            WHERE survey_id = ANY($1::int[])
+            ORDER BY survey_id, position;""",
+)
 
 
 class QuestionType(Enum):
@@ -45,19 +53,6 @@ class SurveyQuestion(ABC):
         self.title = title
         self.template = template_id
 
-    @classmethod
-    async def fetch(cls, id: int):
-        """
-        Gets The Question From The Database By ID
-        :param id: The ID of the question
-        :return: An instance of the class it is called on
-        """
-        sql = """
-                SELECT text, questions.id, position, survey_id, required, description, type, question_data 
-                FROM surveys.questions
-                WHERE questions.id=$1;"""
-        return await cls.load(await db.fetch_one(sql, id))
-
     @abstractmethod
     async def set_up(self, interaction: discord.Interaction) -> discord.Interaction:
         """
@@ -68,10 +63,11 @@ class SurveyQuestion(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    async def send_question(self, interaction: discord.Interaction) -> discord.Interaction:
+    async def send_question(self, interaction: discord.Interaction, session: SurveySession) -> discord.Interaction:
         """
         Sends The Question To A User Taking The Survey And Gathers The Response
         :param interaction: The interaction that is pending a response from the prior action
+        :param session: The session of the user the answer is stored in
         :return: An interaction with no response to be used by the next action
         """
         raise NotImplementedError
@@ -101,9 +97,10 @@ class SurveyQuestion(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    async def _create_response_data(self) -> dict:
+    async def _create_response_data(self, session: SurveySession) -> dict:
         """
         Creates The JSONB Data For The Response To The Question To Be Inserted Into The Responses Table Of The Database
+        :param session: The session holding the users answer
         :return: A dict that is converted to string by asyncpg
         """
         raise NotImplementedError
@@ -124,16 +121,23 @@ class SurveyQuestion(ABC):
         """
         raise NotImplementedError
 
-    @abstractmethod
-    async def save_response(self, conn: Connection, encrypted_user_id: str, active_id: int, response_id: int) -> None:
+    async def response_row(
+        self, response_id: int | None, session: SurveySession
+    ) -> tuple[int | None, int, dict] | None:
         """
-        Saves The Users Response To This Question To The Database
-        :param conn: The Database connection to use. Useful for batching requests
-        :param encrypted_user_id: The user ID of the user that submitted the answer
-        :param active_id: The ID of the survey
+        Creates The Row For The Users Response To This Question. The Template Inserts All Rows In One Batch
         :param response_id: The ID of the main response row
+        :param session: The session holding the users answer
+        :return: A (response, question, response_data) tuple or None if there is nothing to save
         """
-        raise NotImplementedError
+        return response_id, self._id, await self._create_response_data(session)
+
+    def estimated_size(self) -> int:
+        """
+        A Rough Number Of Bytes The Question Uses In Memory. Used To Bound The Size Of The Template Cache
+        :return: The estimate in bytes
+        """
+        return 512 + len(self.title) + len(self.description or "")
 
     @classmethod
     @abstractmethod
@@ -158,6 +162,15 @@ class SurveyQuestion(ABC):
         """
         raise NotImplementedError
 
+    async def view_responses(self, responses: list[dict]) -> list[str]:
+        """
+        A Short String Representation Of Many Responses To The Question. Subclasses Override This To Do The Work Once
+        For The Whole Batch Instead Of Once Per Response
+        :param responses: The JSONB response data columns from the question response rows
+        :return: A string representation of each response in the same order
+        """
+        return [await self.view_response(x) for x in responses]
+
 
 class GetBaseInfo(discord.ui.Modal):
     interaction: discord.Interaction
@@ -207,16 +220,39 @@ class GetBaseInfo(discord.ui.Modal):
             )
 
 
-async def from_db(row) -> SurveyQuestion:
-    if row["type"] == QuestionType.TEXT.value:
+# Use Of Lazy Imports In The `_question_class` Function
+def _question_class(question_type: int) -> type[SurveyQuestion]:
+    if question_type == QuestionType.TEXT.value:
         from questions.text_question import TextQuestion
 
-        return await TextQuestion.fetch(row["id"])
-    elif row["type"] == QuestionType.MULTIPLE_CHOICE.value:
+        return TextQuestion
+    elif question_type == QuestionType.MULTIPLE_CHOICE.value:
         from questions.multiple_choice import MultipleChoice
 
-        return await MultipleChoice.fetch(row["id"])
-    elif row["type"] == QuestionType.DATETIME.value:
+        return MultipleChoice
+    elif question_type == QuestionType.DATETIME.value:
         from questions.datetime_question import DateQuestion
 
-        return await DateQuestion.fetch(row["id"])
+        return DateQuestion
+    raise ValueError(f"Invalid Question Type {question_type}")
+
+
+async def from_row(row: Record) -> SurveyQuestion:
+    """
+    Creates The Correct SurveyQuestion Subclass From A Full Question Row Without Another Query
+    :param row: A row containing every column of the questions table
+    """
+    return await _question_class(row["type"]).load(row)
+
+
+async def fetch_questions(*template_ids: int, replica: bool = True) -> dict[int, list[SurveyQuestion]]:
+    """
+    Loads The Questions Of One Or Many Templates In A Single Query
+    :param template_ids: The IDs of the templates to load the questions of
+    :param replica: If the read replica may be used. Pass False when the questions are cached
+    :return: A mapping of template ID to its questions sorted by position
+    """
+    questions: dict[int, list[SurveyQuestion]] = {x: [] for x in template_ids}
+    for row in await db.fetch(TEMPLATE_QUESTIONS, list(template_ids), replica=replica):
+        questions[row["survey_id"]].append(await from_row(row))
+    return questions
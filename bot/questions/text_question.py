@@ -2,9 +2,11 @@ import discord
 from asyncpg import Record, Connection
 
 from questions.input_text_response import InputTextResponse
+from questions.session import SurveySession
 from questions.survey_question import QuestionType, GetBaseInfo
 
 from utils.database import database as db
+from utils.invalidation import publish_template_change
 
 
 class TextQuestion(InputTextResponse):
@@ -20,8 +22,6 @@ class TextQuestion(InputTextResponse):
         self.min_length: int = 0
         self.max_length: int = 4000
 
-        self.value: str = ""
-
     async def display(self) -> discord.Embed:
         e = discord.Embed(title=self.title, description=self.description)
         e.add_field(name="Required", value=str(self.required))
@@ -37,15 +37,15 @@ class TextQuestion(InputTextResponse):
             "max_length": self.max_length,
         }
 
-    async def _create_response_data(self) -> dict:
+    async def _create_response_data(self, session: SurveySession) -> dict:
         return {
-            "text": self.value,
+            "text": session.get(self, ""),
         }
 
     async def save(self, position: int, conn: Connection = None) -> None:
-        # Setting conn to be either a Connection or my Database object is probably bad practice
         if conn is None:
-            conn = db
+            async with db.transaction() as conn:
+                return await self.save(position, conn)
         if self._id:
             base_sql = """
             UPDATE surveys.questions 
@@ -83,6 +83,7 @@ class TextQuestion(InputTextResponse):
     async def delete(self) -> None:
         sql = """DELETE FROM surveys.questions WHERE id=$1;"""
         await db.execute(sql, self._id)
+        await publish_template_change(self.template)
 
     async def set_up(self, interaction: discord.Interaction) -> discord.Interaction:
         m = GetTextQuestionInfo(self)
@@ -98,10 +99,6 @@ class TextQuestion(InputTextResponse):
     #     WHERE questions.id=$1;"""
     #     return await TextQuestion.load(await db.fetch_one(sql, id))
 
-    async def save_response(self, conn: Connection, encrypted_user_id: str, active_id: int, response_id: int):
-        sql = """INSERT INTO surveys.question_response (response, question, response_data) VALUES ($1, $2, $3);"""
-        await conn.execute(sql, response_id, self._id, await self._create_response_data())
-
     @classmethod
     async def load(cls, row: Record):
         q = await super().load(row)
@@ -113,8 +110,11 @@ class TextQuestion(InputTextResponse):
         result = response["text"]
         return result
 
-    def get_input_text(self) -> discord.ui.InputText:
-        return discord.ui.InputText(
+    async def view_responses(self, responses: list[dict]) -> list[str]:
+        return [x["text"] for x in responses]
+
+    def input_text_spec(self) -> dict:
+        return dict(
             label=self.title[: min(len(self.title), 45)],
             min_length=self.min_length,
             max_length=self.max_length,
@@ -122,8 +122,8 @@ class TextQuestion(InputTextResponse):
             style=discord.InputTextStyle.long,
         )
 
-    async def handle_input_text_response(self, text: str) -> str | None:
-        self.value = text
+    async def handle_input_text_response(self, text: str, session: SurveySession) -> str | None:
+        session.set(self, text)
         # Text questions have no criteria other than the length which is handled by Discord
         return None
 
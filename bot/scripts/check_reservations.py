@@ -0,0 +1,55 @@
+"""
+Checks That Concurrent Clicks Can Never Reserve More Entries Than The Maximum Of A Survey
+
+Run it from the folder with `config.yaml` and the same environment as the bot, against a development database:
+    PYTHONPATH=bot python -m scripts.check_reservations <active survey id> [clicks]
+
+The maximum is set to the current entries plus half of the clicks, every click reserves at the same time and then
+every reservation that was made is released, so the survey is left as it was.
+"""
+
+import asyncio
+import sys
+
+import yaml
+from dotenv import load_dotenv
+
+from forms.survey.active import RESERVE_ENTRY, RELEASE_ENTRY
+from utils.database import database as db
+
+ENTRIES = db.statement("check_entries", """SELECT entries FROM surveys.active_guild_surveys WHERE id = $1;""")
+
+
+async def check(active_id: int, clicks: int) -> None:
+    before = await db.fetchval(ENTRIES, active_id, replica=False)
+    if before is None:
+        raise SystemExit(f"There Is No Active Survey With The ID {active_id}")
+    maximum = before + clicks // 2
+
+    results = await asyncio.gather(
+        *[db.fetchval(RESERVE_ENTRY, active_id, maximum, replica=False) for _ in range(clicks)]
+    )
+    reserved = [x for x in results if x is not None]
+    try:
+        after = await db.fetchval(ENTRIES, active_id, replica=False)
+        print(f"{len(reserved)} Of {clicks} Clicks Reserved An Entry. Entries Went From {before} To {after}")
+        assert max(reserved, default=before) <= maximum, "An Entry Was Reserved Past The Maximum"
+        assert len(reserved) == maximum - before, "Some Clicks Were Turned Away While Entries Were Free"
+        assert after == maximum, "The Entries Do Not Match The Reservations"
+    finally:
+        for _ in reserved:
+            await db.execute(RELEASE_ENTRY, active_id)
+    print("Passed")
+
+
+def main() -> None:
+    load_dotenv()
+    with open("config.yaml") as stream:
+        db.configure(**yaml.safe_load(stream).get("database", {}))
+    active_id = int(sys.argv[1])
+    clicks = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    asyncio.run(check(active_id, clicks))
+
+
+if __name__ == "__main__":
+    main()
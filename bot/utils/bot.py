@@ -6,6 +6,10 @@ import yaml
 
 import discord
 from utils.database import database
+from utils.migrations import migrate, pending_migrations
+from forms.survey.responses import response_queue
+from forms.survey.active import consent_cache, reconcile_entries
+from forms.survey.template import listen_for_template_changes, template_cache
 from . import embed_factory as ef
 from discord import Interaction, ApplicationContext, DiscordException
 
@@ -40,11 +44,17 @@ class SurveyWolf(discord.Bot, ABC):
 
         self._raw_config = config
         self.config = self._raw_config.copy()
+        database.configure(**self.config.get("database", {}))
+        response_queue.configure(**self.config.get("ingestion", {}))
+        caches = self.config.get("caches", {})
+        template_cache.configure(**caches.get("templates", {}))
+        consent_cache.configure(**caches.get("consent", {}))
 
     async def on_ready(self):
         if self._did_on_ready:
             return
         self._did_on_ready = True
+        await response_queue.start()
         # Do Some Additional Processing On Some Config Items
         self.config.update(
             {
@@ -52,6 +62,24 @@ class SurveyWolf(discord.Bot, ABC):
                 "server_join_leave_webhook": await self._create_webhook(self.config["server_join_leave_webhook"]),
             }
         )
+        # The Webhooks Are Resolved First So Errors Can Be Logged Even If The Listener Cannot Connect
+        await listen_for_template_changes()
+
+    async def start(self, *args, **kwargs) -> None:
+        # Migrations Run Before Logging In So Nothing Queries The Old Schema
+        if self.config.get("migrate_on_start", True):
+            for migration in await migrate():
+                print(f"Applied Migration {migration}")
+        elif pending := await pending_migrations():
+            raise RuntimeError(f"The Database Schema Is Out Of Date. Run The Migrations: {', '.join(pending)}")
+        # Nothing Can Reserve An Entry Until The Bot Is Logged In
+        await reconcile_entries()
+        await super().start(*args, **kwargs)
+
+    async def close(self) -> None:
+        await response_queue.stop()
+        await database.close_listener()
+        await super().close()
 
     async def _create_webhook(self, url: str) -> discord.Webhook | None:
         if url == "None":
@@ -0,0 +1,65 @@
+from collections.abc import Callable
+
+from cachetools import LRUCache, TTLCache
+
+
+class CountingLRUCache(LRUCache):
+    """
+    An LRUCache That Counts How Many Items It Has Evicted To Make Room For New Ones
+
+    Attributes
+    ----------
+    evictions: int
+        The number of items removed because the cache was full.
+    """
+
+    def __init__(self, maxsize: int, getsizeof=None):
+        super().__init__(maxsize, getsizeof)
+        self.evictions: int = 0
+
+    def popitem(self):
+        # Only Called By cachetools When The Cache Is Full
+        self.evictions += 1
+        return super().popitem()
+
+
+class CountingTTLCache(TTLCache):
+    """
+    A TTLCache That Counts Evictions Like `CountingLRUCache` And Also Counts Expired Items
+
+    Attributes
+    ----------
+    evictions: int
+        The number of items removed because the cache was full.
+    expirations: int
+        The number of items removed because they were older than the TTL.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, getsizeof=None):
+        super().__init__(maxsize, ttl, getsizeof=getsizeof)
+        self.evictions: int = 0
+        self.expirations: int = 0
+
+    def popitem(self):
+        self.evictions += 1
+        return super().popitem()
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        self.expirations += len(expired)
+        return expired
+
+
+def create_cache(
+    maxsize: int, ttl: float | None = None, getsizeof: Callable[[object], int] | None = None
+) -> CountingLRUCache | CountingTTLCache:
+    """
+    Creates A Counting Cache From The Config Options
+    :param maxsize: The most entries, or the total size when `getsizeof` is given
+    :param ttl: Seconds an entry is kept for. None keeps entries until they are evicted
+    :param getsizeof: Estimates the size of an entry
+    :return: The cache
+    """
+    if ttl:
+        return CountingTTLCache(maxsize, ttl, getsizeof)
+    return CountingLRUCache(maxsize, getsizeof)
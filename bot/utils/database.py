@@ -1,78 +1,447 @@
+import asyncio
 import json
+from collections.abc import AsyncIterator, Callable
 from contextlib import asynccontextmanager
 from os import environ
+from time import perf_counter
 import asyncpg
 
-from asyncpg.exceptions import InterfaceError
+from asyncpg.exceptions import (
+    ConnectionDoesNotExistError,
+    InterfaceError,
+    PostgresConnectionError,
+)
 from asyncpg.transaction import Transaction
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def default_json_codec() -> tuple[Callable[[object], str], Callable[[str], object]]:
+    """
+    Picks The Fastest Available JSON Library For The jsonb Codec
+    :return: The encoder and decoder to use
+    """
+    if orjson is not None:
+        return lambda obj: orjson.dumps(obj).decode(), orjson.loads
+    return json.dumps, json.loads
+
+
+# Kept As A Name So Callers Can Annotate Pooled Connections Without Importing asyncpg
+Connection = asyncpg.Connection
+
+
+class Statement:
+    """
+    A Named SQL Statement. asyncpg Prepares It Once Per Connection Through Its Own Statement Cache, So This Only Adds
+    A Name To Track The Statistics Under
+
+    Attributes
+    ----------
+    name: str
+        The unique name of the statement in the registry.
+    sql: str
+        The SQL that is run.
+    calls: int
+        The number of times the statement has been run.
+    total_time: float
+        The total seconds spent running the statement.
+    max_time: float
+        The longest single run of the statement in seconds.
+    """
+
+    def __init__(self, name: str, sql: str):
+        self.name = name
+        self.sql = sql
+        self.calls: int = 0
+        self.total_time: float = 0.0
+        self.max_time: float = 0.0
+
+    @property
+    def average_time(self) -> float:
+        return self.total_time / self.calls if self.calls else 0.0
+
+    async def _run(self, conn: Connection, method: str, *args, **kwargs):
+        start = perf_counter()
+        try:
+            return await getattr(conn, method)(self.sql, *args, **kwargs)
+        finally:
+            elapsed = perf_counter() - start
+            self.calls += 1
+            self.total_time += elapsed
+            self.max_time = max(self.max_time, elapsed)
+
+    async def execute(self, conn: Connection, *args, timeout=None) -> None:
+        await self._run(conn, "execute", *args, timeout=timeout)
+
+    async def fetchval(self, conn: Connection, *args, column=0, timeout=None):
+        return await self._run(conn, "fetchval", *args, column=column, timeout=timeout)
+
+    async def fetch(self, conn: Connection, *args, timeout=None) -> list[asyncpg.Record]:
+        return await self._run(conn, "fetch", *args, timeout=timeout)
+
+    async def fetchrow(self, conn: Connection, *args, timeout=None) -> asyncpg.Record | None:
+        return await self._run(conn, "fetchrow", *args, timeout=timeout)
+
+    async def executemany(self, conn: Connection, args, timeout=None) -> None:
+        await self._run(conn, "executemany", args, timeout=timeout)
+
+
+class PoolStats:
+    """
+    Counters For How Saturated The Connection Pool Is
+
+    Attributes
+    ----------
+    acquires: int
+        The number of connections checked out of the pool.
+    timeouts: int
+        The number of checkouts that gave up after the acquire timeout.
+    in_use: int
+        The number of connections currently checked out.
+    waiting: int
+        The number of callers currently waiting for a connection.
+    total_wait: float
+        The total seconds spent waiting for connections.
+    max_wait: float
+        The longest single wait for a connection in seconds.
+    """
+
+    def __init__(self):
+        self.acquires: int = 0
+        self.timeouts: int = 0
+        self.in_use: int = 0
+        self.max_in_use: int = 0
+        self.waiting: int = 0
+        self.max_waiting: int = 0
+        self.total_wait: float = 0.0
+        self.max_wait: float = 0.0
+
+    @property
+    def average_wait(self) -> float:
+        return self.total_wait / self.acquires if self.acquires else 0.0
+
+
+def _env_or(name: str, default, convert: Callable = int):
+    try:
+        return convert(environ[name])
+    except KeyError:
+        return default
+
+
+# Errors That Mean The Server Cannot Be Reached. Reads Fall Back To The Primary When The Replica Raises These, Except
+# For Timeouts Which Only Count When The Replica Pool Is First Being Connected
+CONNECTION_ERRORS = (OSError, asyncio.TimeoutError, PostgresConnectionError, ConnectionDoesNotExistError)
+
 
 class Database:
     def __init__(self) -> None:
         self._connection_pool = None
+        self._replica_pool = None
+        self._replica_down_until: float = 0.0
+        self._connect_lock = asyncio.Lock()
+        self.statements: dict[str, Statement] = {}
+        self.pool_stats = PoolStats()
+        self.replica_stats = PoolStats()
+        self.replica_fallbacks: int = 0
+        self._listener: asyncpg.Connection | None = None
+        self._listen_callbacks: dict[str, list[Callable[[str | None], None]]] = {}
+        self._reconnect_task: asyncio.Task | None = None
+        self._json_encoder, self._json_decoder = default_json_codec()
+        self.configure()
 
-    async def connect(self):
-        if not self._connection_pool:
-            self._connection_pool = await asyncpg.create_pool(
-                database=environ["db_name"],
-                host=environ["db_host"],
-                user=environ["db_user"],
-                password=environ["db_password"],
-                min_size=3,
-                max_size=15,
-            )
-
-    async def _acquire(self):
-        if not self._connection_pool:
-            await self.connect()
-        conn: asyncpg.Connection = await self._connection_pool.acquire()
+    def configure(
+        self,
+        min_size: int = 3,
+        max_size: int = 15,
+        acquire_timeout: float | None = 10,
+        statement_timeout: float | None = None,
+        replica_retry: float = 30,
+    ) -> None:
+        """
+        Sets The Pool Options. Environment Variables Take Priority Over The Given Values
+        :param min_size: The number of connections the pool keeps open
+        :param max_size: The most connections the pool will open
+        :param acquire_timeout: Seconds to wait for a free connection before raising `asyncio.TimeoutError`
+        :param statement_timeout: Seconds a single statement may run before the server cancels it
+        :param replica_retry: Seconds to send reads to the primary after the read replica could not be reached
+        """
+        if self._connection_pool:
+            raise RuntimeError("The Pool Cannot Be Configured After It Is Created")
+        self.min_size: int = _env_or("db_min_size", min_size)
+        self.max_size: int = _env_or("db_max_size", max_size)
+        self.acquire_timeout: float | None = _env_or("db_acquire_timeout", acquire_timeout, float)
+        self.statement_timeout: float | None = _env_or("db_statement_timeout", statement_timeout, float)
+        self.replica_retry: float = _env_or("db_replica_retry", replica_retry, float)
+
+    def set_json_codec(self, encoder: Callable[[object], str], decoder: Callable[[str], object]) -> None:
+        """
+        Sets The JSON Encoder And Decoder Used For jsonb Columns. Must Be Called Before The Pool Is Created
+        :param encoder: Converts a python object to a JSON string
+        :param decoder: Converts a JSON string to a python object
+        """
+        if self._connection_pool:
+            raise RuntimeError("The JSON Codec Cannot Be Changed After The Pool Is Created")
+        self._json_encoder, self._json_decoder = encoder, decoder
+
+    async def _setup_connection(self, conn: asyncpg.Connection) -> None:
+        # Runs Once For Each New Connection In The Pool Rather Than On Every Acquire
         await conn.set_type_codec(
             "jsonb",
-            encoder=json.dumps,
-            decoder=json.loads,
+            encoder=self._json_encoder,
+            decoder=self._json_decoder,
             schema="pg_catalog",
         )
+
+    @staticmethod
+    def _connect_settings(prefix: str) -> dict:
+        # The Replica Uses The Same Settings As The Primary Unless Its Own Are Set
+        def setting(name: str) -> str | None:
+            return environ.get(f"{prefix}_{name}", environ.get(f"db_{name}"))
+
+        port = setting("port")
+        return dict(
+            database=setting("name"),
+            host=setting("host"),
+            port=int(port) if port else None,
+            user=setting("user"),
+            password=setting("password"),
+        )
+
+    async def _create_pool(self, prefix: str) -> asyncpg.Pool:
+        server_settings = {}
+        if self.statement_timeout:
+            server_settings["statement_timeout"] = str(int(self.statement_timeout * 1000))
+        return await asyncpg.create_pool(
+            **self._connect_settings(prefix),
+            min_size=self.min_size,
+            max_size=self.max_size,
+            init=self._setup_connection,
+            server_settings=server_settings,
+        )
+
+    async def connect(self):
+        async with self._connect_lock:
+            if not self._connection_pool:
+                self._connection_pool = await self._create_pool("db")
+
+    @property
+    def has_replica(self) -> bool:
+        return "db_replica_host" in environ
+
+    async def _replica_ready(self) -> bool:
+        """Connects To The Read Replica If Needed. Returns False If Reads Should Go To The Primary"""
+        if not self.has_replica or perf_counter() < self._replica_down_until:
+            return False
+        if self._replica_pool:
+            return True
+        async with self._connect_lock:
+            if not self._replica_pool:
+                try:
+                    self._replica_pool = await self._create_pool("db_replica")
+                except CONNECTION_ERRORS:
+                    self._mark_replica_down()
+                    return False
+        return True
+
+    def _mark_replica_down(self) -> None:
+        self.replica_fallbacks += 1
+        self._replica_down_until = perf_counter() + self.replica_retry
+
+    @property
+    def pool_size(self) -> int:
+        return self._connection_pool.get_size() if self._connection_pool else 0
+
+    @property
+    def replica_pool_size(self) -> int:
+        return self._replica_pool.get_size() if self._replica_pool else 0
+
+    def statement(self, name: str, sql: str) -> Statement:
+        """
+        Registers A Named Statement That Can Be Passed In Place Of SQL To Any Query Method
+        :param name: A unique name for the statement. Used when displaying statistics
+        :param sql: The SQL of the statement
+        :return: The registered statement
+        """
+        if name in self.statements:
+            if self.statements[name].sql != sql:
+                raise ValueError(f"A Different Statement Is Already Registered As {name}")
+            return self.statements[name]
+        self.statements[name] = Statement(name, sql)
+        return self.statements[name]
+
+    @staticmethod
+    async def _run(conn: Connection, method: str, sql: str | Statement, *args, **kwargs):
+        if isinstance(sql, Statement):
+            return await getattr(sql, method)(conn, *args, **kwargs)
+        return await getattr(conn, method)(sql, *args, **kwargs)
+
+    async def _acquire(self, pool: asyncpg.Pool, stats: PoolStats, timeout: float | None = None) -> Connection:
+        stats.waiting += 1
+        stats.max_waiting = max(stats.max_waiting, stats.waiting)
+        start = perf_counter()
+        try:
+            conn: Connection = await pool.acquire(timeout=timeout or self.acquire_timeout)
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            raise
+        finally:
+            stats.waiting -= 1
+        waited = perf_counter() - start
+        stats.acquires += 1
+        stats.total_wait += waited
+        stats.max_wait = max(stats.max_wait, waited)
+        stats.in_use += 1
+        stats.max_in_use = max(stats.max_in_use, stats.in_use)
         return conn
 
-    async def _recycle(self, conn):
+    @staticmethod
+    async def _recycle(pool: asyncpg.Pool, stats: PoolStats, conn: Connection):
+        stats.in_use -= 1
         try:
-            await self._connection_pool.release(conn)
+            await pool.release(conn)
         except InterfaceError:
             pass
 
-    async def execute(self, sql: str, *args) -> None:
-        conn = await self._acquire()
-        await conn.execute(sql, *args)
-        await self._recycle(conn)
-
-    async def fetchval(self, sql: str, *args, column=0, timeout=None):
-        conn = await self._acquire()
-        val = await conn.fetchval(sql, *args, column=column, timeout=timeout)
-        await self._recycle(conn)
-        return val
-
-    async def fetch(self, sql: str, *args) -> list[asyncpg.Record]:
-        conn = await self._acquire()
-        rows: list[asyncpg.Record] = await conn.fetch(sql, *args)
-        await self._recycle(conn)
+    @asynccontextmanager
+    async def acquire(self, timeout: float | None = None, replica: bool = False) -> AsyncIterator[Connection]:
+        """
+        Checks Out A Connection That Is Always Returned To The Pool, Even If The Body Raises
+        :param timeout: Seconds to wait for a connection. Defaults to the configured acquire timeout
+        :param replica: If the connection should come from the read replica. Only use this for read only work. The
+            primary is used instead if the replica cannot be reached
+        """
+        conn = None
+        if replica and await self._replica_ready():
+            pool, stats = self._replica_pool, self.replica_stats
+            try:
+                conn = await self._acquire(pool, stats, timeout)
+            except asyncio.TimeoutError:
+                # Every Replica Connection Is Busy, Which Does Not Mean The Replica Is Down
+                raise
+            except CONNECTION_ERRORS:
+                self._mark_replica_down()
+        if conn is None:
+            if not self._connection_pool:
+                await self.connect()
+            pool, stats = self._connection_pool, self.pool_stats
+            conn = await self._acquire(pool, stats, timeout)
+        try:
+            yield conn
+        finally:
+            await self._recycle(pool, stats, conn)
+
+    async def _read(self, method: str, sql: str | Statement, *args, replica: bool, **kwargs):
+        if replica and await self._replica_ready():
+            try:
+                async with self.acquire(replica=True) as conn:
+                    return await self._run(conn, method, sql, *args, **kwargs)
+            except asyncio.TimeoutError:
+                # A Saturated Pool Or A Slow Query Is Not A Reason To Send Every Read To The Primary
+                raise
+            except CONNECTION_ERRORS:
+                self._mark_replica_down()
+        async with self.acquire() as conn:
+            return await self._run(conn, method, sql, *args, **kwargs)
+
+    async def execute(self, sql: str | Statement, *args) -> None:
+        async with self.acquire() as conn:
+            await self._run(conn, "execute", sql, *args)
+
+    # The Read Helpers Go To The Read Replica When One Is Configured. Pass `replica=False` For Writes That Return
+    # Rows Or Reads That Must See The Latest Data
+
+    async def fetchval(self, sql: str | Statement, *args, column=0, timeout=None, replica: bool = True):
+        return await self._read("fetchval", sql, *args, replica=replica, column=column, timeout=timeout)
+
+    async def fetch(self, sql: str | Statement, *args, replica: bool = True) -> list[asyncpg.Record]:
+        rows: list[asyncpg.Record] = await self._read("fetch", sql, *args, replica=replica)
         return rows or []
 
-    async def fetch_one(self, sql: str, *args) -> asyncpg.Record | None:
-        conn = await self._acquire()
-        row: asyncpg.Record = await conn.fetchrow(sql, *args)
-        await self._recycle(conn)
-        return row
+    async def fetch_one(self, sql: str | Statement, *args, replica: bool = True) -> asyncpg.Record | None:
+        return await self._read("fetchrow", sql, *args, replica=replica)
 
     @asynccontextmanager
     async def transaction(self) -> tuple[asyncpg.Connection, Transaction]:
-        conn = None
-        try:
-            conn = await self._acquire()
+        async with self.acquire() as conn:
             async with conn.transaction():
                 yield conn
+
+    async def notify(self, channel: str, payload: str, conn: Connection | None = None) -> None:
+        """
+        Sends A Notification To Every Process Listening On The Channel
+        :param channel: The channel to notify
+        :param payload: The text sent with the notification
+        :param conn: A connection in a transaction. The notification is then only sent if the transaction commits
+        """
+        if conn is None:
+            await self.execute("SELECT pg_notify($1, $2);", channel, payload)
+        else:
+            await conn.execute("SELECT pg_notify($1, $2);", channel, payload)
+
+    async def listen(self, channel: str, callback: Callable[[str | None], None]) -> None:
+        """
+        Calls The Callback With The Payload Of Each Notification On The Channel. Notifications Are Received On A
+        Dedicated Connection Outside The Pool. If It Cannot Connect Or Drops, It Keeps Trying In The Background.
+        Notifications Sent Before It Reconnects Are Lost, So The Callback Is Called With None After Reconnecting
+        :param channel: The channel to listen on
+        :param callback: A function that takes the payload
+        """
+        self._listen_callbacks.setdefault(channel, []).append(callback)
+        if self._reconnect_task is not None:
+            # The Channel Is Listened On Once The Connection Is Back
+            return
+        if self._listener is None:
+            try:
+                await self._connect_listener()
+            except CONNECTION_ERRORS:
+                self._reconnect_task = asyncio.create_task(self._reconnect_listener())
+        elif len(self._listen_callbacks[channel]) == 1:
+            await self._listener.add_listener(channel, self._dispatch)
+
+    async def _connect_listener(self) -> None:
+        self._listener = await asyncpg.connect(**self._connect_settings("db"))
+        self._listener.add_termination_listener(self._on_listener_lost)
+        for channel in self._listen_callbacks:
+            await self._listener.add_listener(channel, self._dispatch)
+
+    def _dispatch(self, conn: asyncpg.Connection, pid: int, channel: str, payload: str | None) -> None:
+        for callback in self._listen_callbacks.get(channel, []):
+            try:
+                callback(payload)
+            except Exception as e:
+                print(f"Listener For {channel} Failed: {e!r}")
+
+    def _on_listener_lost(self, conn: asyncpg.Connection) -> None:
+        if conn is not self._listener or self._reconnect_task is not None:
+            return
+        self._listener = None
+        self._reconnect_task = asyncio.create_task(self._reconnect_listener())
+
+    async def _reconnect_listener(self) -> None:
+        delay = 1
+        try:
+            while True:
+                try:
+                    await self._connect_listener()
+                    break
+                except CONNECTION_ERRORS:
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 60)
         finally:
-            if conn is not None:
-                await self._recycle(conn)
+            self._reconnect_task = None
+        for channel in self._listen_callbacks:
+            self._dispatch(self._listener, 0, channel, None)
+
+    async def close_listener(self) -> None:
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        if self._listener is not None:
+            listener, self._listener = self._listener, None
+            await listener.close()
 
 
 database = Database()
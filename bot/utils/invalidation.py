@@ -0,0 +1,19 @@
+import json
+from uuid import uuid4
+
+from utils.database import database as db, Connection
+
+TEMPLATE_CHANNEL = "surveywolf_template_changed"
+# Sent With Every Notification So A Process Can Ignore The Changes It Made Itself
+PROCESS_TOKEN = uuid4().hex
+
+
+async def publish_template_change(template_id: int, guild_id: int | None = None, conn: Connection | None = None):
+    """
+    Tells Every Other Bot Process That A Template Or One Of Its Questions Changed
+    :param template_id: The ID of the template
+    :param guild_id: The ID of the guild the template is in, if it is known
+    :param conn: A connection in a transaction. The notice is then only sent if the transaction commits
+    """
+    payload = json.dumps({"origin": PROCESS_TOKEN, "template": template_id, "guild": guild_id})
+    await db.notify(TEMPLATE_CHANNEL, payload, conn)
@@ -0,0 +1,75 @@
+import bisect
+import math
+
+# Upper Bounds In Seconds. Discord Fails An Interaction That Is Not Responded To Within 3 Seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, math.inf)
+
+
+class Histogram:
+    """
+    Counts Timings Into Fixed Buckets So Percentiles Can Be Estimated Without Keeping Every Sample
+
+    Attributes
+    ----------
+    name: str
+        The name shown in the stats command.
+    buckets: tuple[float, ...]
+        The upper bound of each bucket in seconds.
+    counts: list[int]
+        How many samples fell in each bucket.
+    count: int
+        The total number of samples.
+    total: float
+        The sum of every sample in seconds.
+    max: float
+        The largest sample in seconds.
+    """
+
+    def __init__(self, name: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.buckets = buckets
+        self.counts: list[int] = [0] * len(buckets)
+        self.count: int = 0
+        self.total: float = 0.0
+        self.max: float = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    @property
+    def average(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> float:
+        """
+        Estimates A Percentile As The Upper Bound Of The Bucket It Falls In
+        :param p: The percentile between 0 and 100
+        :return: The estimate in seconds. The largest sample is used for the last bucket
+        """
+        if not self.count:
+            return 0.0
+        target = self.count * p / 100
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+histograms: dict[str, Histogram] = {}
+
+
+def histogram(name: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    """
+    Gets Or Creates A Histogram So It Is Shown In The Stats Command
+    :param name: A unique name for the histogram
+    :param buckets: The upper bound of each bucket in seconds
+    :return: The histogram
+    """
+    if name not in histograms:
+        histograms[name] = Histogram(name, buckets)
+    return histograms[name]
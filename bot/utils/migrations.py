@@ -0,0 +1,110 @@
+import asyncio
+import re
+from pathlib import Path
+
+from utils.database import database as db
+
+MIGRATIONS_DIR = Path(__file__).parent.parent / "migrations"
+# An Arbitrary Key So Only One Process Applies Migrations At A Time
+MIGRATION_LOCK_ID = 7_301_955
+
+CREATE_MIGRATIONS_TABLE = """
+CREATE SCHEMA IF NOT EXISTS surveys;
+CREATE TABLE IF NOT EXISTS surveys.schema_migrations (
+    version integer PRIMARY KEY,
+    name text NOT NULL,
+    applied_at timestamp NOT NULL DEFAULT (NOW() AT TIME ZONE 'utc')
+);
+"""
+RECORD_MIGRATION = "INSERT INTO surveys.schema_migrations (version, name) VALUES ($1, $2);"
+# The First Line Of A Migration That Cannot Run Inside A Transaction
+NO_TRANSACTION = "-- no-transaction"
+# A `CREATE INDEX CONCURRENTLY` That Fails Leaves An Invalid Index Behind, Which `IF NOT EXISTS` Would Then Skip
+INVALID_INDEXES = """SELECT format('%I.%I', n.nspname, c.relname) AS name FROM pg_index AS i
+    JOIN pg_class AS c ON c.oid = i.indexrelid JOIN pg_namespace AS n ON n.oid = c.relnamespace
+    WHERE n.nspname = 'surveys' AND NOT i.indisvalid;"""
+
+
+def get_migrations() -> list[tuple[int, str, Path]]:
+    """
+    Finds The Migration Files. Each File Is Named `<version>_<name>.sql`
+    :return: A list of (version, name, path) sorted by version
+    """
+    migrations = []
+    for path in MIGRATIONS_DIR.glob("*.sql"):
+        match = re.fullmatch(r"(\d+)_(.+)\.sql", path.name)
+        if match is None:
+            raise ValueError(f"Migration File {path.name} Must Be Named <version>_<name>.sql")
+        migrations.append((int(match.group(1)), match.group(2), path))
+    return sorted(migrations)
+
+
+def split_statements(sql: str) -> list[str]:
+    """
+    Splits A Migration Into Its Statements So They Can Be Run One At A Time. Statements Must End With `;` At The End
+    Of A Line
+    :param sql: The text of the migration
+    :return: The statements, skipping any that are only comments
+    """
+    statements = []
+    for part in re.split(r";[ \t]*$", sql, flags=re.MULTILINE):
+        code = "\n".join(x for x in part.splitlines() if not x.strip().startswith("--")).strip()
+        if code:
+            statements.append(part.strip() + ";")
+    return statements
+
+
+async def pending_migrations() -> list[str]:
+    """
+    Finds The Migrations That Have Not Been Applied
+    :return: The names of the migrations
+    """
+    async with db.acquire() as conn:
+        await conn.execute(CREATE_MIGRATIONS_TABLE)
+        applied = {x["version"] for x in await conn.fetch("SELECT version FROM surveys.schema_migrations;")}
+    return [f"{version:04}_{name}" for version, name, _ in get_migrations() if version not in applied]
+
+
+async def migrate() -> list[str]:
+    """
+    Applies Every Migration That Has Not Been Applied Yet. Each Migration Runs In Its Own Transaction Unless Its First
+    Line Is `-- no-transaction`, Which Is Needed For Statements Like `CREATE INDEX CONCURRENTLY`. Those Statements Are
+    Run One At A Time And Must Be Safe To Run Again In Case The Migration Stops Part Way Through. Invalid Indexes Left
+    By A Build That Failed Are Dropped First So They Are Built Again
+    :return: The names of the migrations that were applied
+    """
+    applied_now = []
+    async with db.acquire() as conn:
+        await conn.execute("SELECT pg_advisory_lock($1);", MIGRATION_LOCK_ID)
+        try:
+            await conn.execute(CREATE_MIGRATIONS_TABLE)
+            applied = {x["version"] for x in await conn.fetch("SELECT version FROM surveys.schema_migrations;")}
+            for version, name, path in get_migrations():
+                if version in applied:
+                    continue
+                sql = path.read_text()
+                if sql.startswith(NO_TRANSACTION):
+                    for index in await conn.fetch(INVALID_INDEXES):
+                        print(f"Dropping Invalid Index {index['name']} Left By A Failed Migration")
+                        await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index['name']};")
+                    # A Script With Several Statements Is Run As One Implicit Transaction, So They Are Sent Separately
+                    for statement in split_statements(sql):
+                        await conn.execute(statement)
+                    await conn.execute(RECORD_MIGRATION, version, name)
+                else:
+                    async with conn.transaction():
+                        await conn.execute(sql)
+                        await conn.execute(RECORD_MIGRATION, version, name)
+                applied_now.append(f"{version:04}_{name}")
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1);", MIGRATION_LOCK_ID)
+    return applied_now
+
+
+if __name__ == "__main__":
+    # Run From The `bot` Directory With `python -m utils.migrations` To Set Up A Fresh Database
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    for migration in asyncio.run(migrate()):
+        print(f"Applied {migration}")
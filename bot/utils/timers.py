@@ -1,10 +1,92 @@
 import asyncio
-from asyncio import sleep
+import heapq
+import itertools
+import traceback
 from datetime import datetime, timedelta
 from time_str import IntervalConverter
 from collections.abc import Callable
 
 
+class Scheduler:
+    """
+    Runs Every Timer From A Single Task Using A Heap Ordered By End Time
+
+    Scheduling is O(log n). Cancelling only marks the timer, which is dropped when it reaches the top of the heap or
+    when cancelled timers make up most of the heap.
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[float, int, "Timer"]] = []
+        self._counter = itertools.count()
+        self._cancelled: int = 0
+        self._task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+        # The Event Loop Only Keeps Weak References To Tasks, So Running Callbacks Are Kept Here Until They Finish
+        self._callbacks: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._heap) - self._cancelled
+
+    def schedule(self, timer: "Timer") -> None:
+        deadline = asyncio.get_running_loop().time() + timer.duration.total_seconds()
+        entry = (deadline, next(self._counter), timer)
+        heapq.heappush(self._heap, entry)
+        timer.scheduled = True
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        elif self._heap[0] is entry:
+            # The New Timer Ends Before The One Being Waited On
+            self._wakeup.set()
+
+    def cancel(self, timer: "Timer") -> None:
+        if not timer.scheduled or timer.cancelled or timer.fired:
+            return
+        timer.cancelled = True
+        self._cancelled += 1
+        if self._cancelled > 64 and self._cancelled > len(self._heap) // 2:
+            self._heap = [x for x in self._heap if not x[2].cancelled]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+
+    def _callback_done(self, task: asyncio.Task) -> None:
+        self._callbacks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            e = task.exception()
+            print("Timer Callback Failed")
+            traceback.print_exception(type(e), e, e.__traceback__)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while self._heap:
+                deadline, _, timer = self._heap[0]
+                if timer.cancelled:
+                    heapq.heappop(self._heap)
+                    self._cancelled -= 1
+                    continue
+
+                delay = deadline - loop.time()
+                if delay > 0:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                heapq.heappop(self._heap)
+                timer.fired = True
+                # Each Callback Gets Its Own Task So A Slow Callback Does Not Delay Other Timers
+                task = asyncio.create_task(timer.callback[0](*timer.callback[1], **timer.callback[2]))
+                self._callbacks.add(task)
+                task.add_done_callback(self._callback_done)
+        finally:
+            self._task = None
+
+
+scheduler = Scheduler()
+
+
 class Timer:
     def __init__(self, time: timedelta | datetime | str, callback: Callable, *args, **kwargs):
         """
@@ -28,20 +110,18 @@ class Timer:
         self.end_time: datetime = self.start_time + duration
         self.duration = duration
         self.callback = (callback, args, kwargs)
+        self.scheduled: bool = False
+        self.cancelled: bool = False
+        self.fired: bool = False
 
         # Start Timer
         if self.duration.total_seconds() > 0:
-            self._task = asyncio.create_task(self._job())
+            scheduler.schedule(self)
 
     @staticmethod
     def str_time(time: str) -> timedelta:
         converter = IntervalConverter(time, max_unit="days")
         return converter.timedelta_relative()
 
-    async def _job(self):
-        await sleep(self.duration.total_seconds())
-        await self.callback[0](*self.callback[1], **self.callback[2])
-
     async def cancel(self):
-        if self._task:
-            self._task.cancel()
+        scheduler.cancel(self)
@@ -0,0 +1,110 @@
+import bisect
+from typing import Any
+
+
+class TitleIndex:
+    """
+    Items Kept Sorted By Their Lowercase Title For Case Insensitive Prefix Lookups With bisect
+
+    Attributes
+    ----------
+    items: list[Any]
+        Every item in the index sorted by title.
+    """
+
+    def __init__(self, items: list[tuple[str, Any]] = ()):
+        pairs = sorted(((title.lower(), item) for title, item in items), key=lambda x: x[0])
+        self._keys: list[str] = [x[0] for x in pairs]
+        self.items: list[Any] = [x[1] for x in pairs]
+        self._titles: dict[Any, str] = {item: key for key, item in pairs}
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __contains__(self, item: Any) -> bool:
+        return item in self._titles
+
+    def set(self, title: str, item: Any) -> None:
+        """
+        Adds An Item Or Moves It If Its Title Changed
+        :param title: The title of the item
+        :param item: The item
+        """
+        key = title.lower()
+        if self._titles.get(item) == key:
+            return
+        self.remove(item)
+        i = bisect.bisect_right(self._keys, key)
+        self._keys.insert(i, key)
+        self.items.insert(i, item)
+        self._titles[item] = key
+
+    def remove(self, item: Any) -> None:
+        key = self._titles.pop(item, None)
+        if key is None:
+            return
+        i = bisect.bisect_left(self._keys, key)
+        while self.items[i] is not item:
+            i += 1
+        del self._keys[i]
+        del self.items[i]
+
+    def prefix(self, query: str, limit: int) -> list[Any]:
+        """
+        Finds Items Whose Title Starts With The Query, Ignoring Case
+        :param query: The start of the title
+        :param limit: The most items to return
+        :return: The matching items in title order
+        """
+        query = query.lower()
+        i = bisect.bisect_left(self._keys, query)
+        end = min(i + limit, len(self._keys))
+        result = []
+        while i < end and self._keys[i].startswith(query):
+            result.append(self.items[i])
+            i += 1
+        return result
+
+    def search(self, query: str, limit: int) -> list[Any]:
+        """
+        Finds Items For Autocomplete. Titles That Start With The Query Come First, Then Titles With A Word Starting
+        With It, Then Titles Containing It And Finally Titles Containing Its Letters In Order
+        :param query: What the user has typed so far
+        :param limit: The most items to return
+        :return: The best matching items
+        """
+        query = query.lower().strip()
+        result = self.prefix(query, limit)
+        if len(result) >= limit or not query:
+            return result
+
+        # Only Search Further When There Are Not Enough Prefix Matches
+        ranked = []
+        for key, item in zip(self._keys, self.items):
+            if key.startswith(query):
+                continue
+            score = self._score(key, query)
+            if score is not None:
+                ranked.append((score, key, len(ranked), item))
+        ranked.sort()
+        return result + [x[3] for x in ranked[: limit - len(result)]]
+
+    @staticmethod
+    def _score(key: str, query: str) -> int | None:
+        position = key.find(query)
+        if position != -1:
+            return 0 if key[position - 1] == " " else 1
+        # Count The Gaps Between The Letters Of The Query In The Title
+        gaps = 0
+        i = 0
+        for char in key:
+            if i == len(query):
+                break
+            if char == query[i]:
+                i += 1
+            elif i > 0:
+                gaps += 1
+        # Letters Spread Across The Whole Title Are Not A Useful Match
+        if i < len(query) or gaps > 2 * len(query):
+            return None
+        return 2 + gaps